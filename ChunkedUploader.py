@@ -0,0 +1,464 @@
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Optional, List, Callable, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.filepost import encode_multipart_formdata
+
+
+class ChunkUploadError(Exception):
+    """分片上传或合并失败"""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class BandwidthLimiter:
+    """
+    令牌桶限速器，所有上传线程共享，限制总上传带宽
+    """
+
+    def __init__(self, rate: float = 0, burst: Optional[int] = None):
+        """
+        :param rate: 限速（字节/秒），<=0表示不限速
+        :param burst: 桶容量（字节），默认为一秒的流量
+        """
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._updated_at = time.monotonic()
+        self.burst = burst
+        self.rate = rate
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @rate.setter
+    def rate(self, value: float):
+        with self._lock:
+            self._rate = max(0.0, float(value))
+            self._capacity = float(self.burst or self._rate)
+            self._tokens = min(self._tokens, self._capacity)
+
+    def consume(self, nbytes: int):
+        """取得发送nbytes字节的配额，超出限速时阻塞等待"""
+        while True:
+            with self._lock:
+                if self._rate <= 0:
+                    return
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+                self._updated_at = now
+                # 超过桶容量的请求允许透支，保证大块数据也能发出
+                need = min(nbytes, self._capacity)
+                if self._tokens >= need:
+                    self._tokens -= nbytes
+                    return
+                wait = (need - self._tokens) / self._rate
+            time.sleep(wait)
+
+
+class _ThrottledBody:
+    """按块读取请求体，每块发送前向限速器申请配额"""
+
+    def __init__(self, data: bytes, limiter: BandwidthLimiter):
+        self._data = memoryview(data)
+        self._limiter = limiter
+        self._offset = 0
+
+    def __len__(self):
+        return len(self._data) - self._offset
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = len(self)
+        block = self._data[self._offset:self._offset + size]
+        self._offset += len(block)
+        if block:
+            self._limiter.consume(len(block))
+        return block.tobytes()
+
+
+class UploadLedger:
+    """
+    上传台账
+    按文件MD5记录每个未完成上传已被服务端确认的分片，持久化到JSON文件，
+    再次上传同一文件时跳过已确认的分片；同时按路径、大小和修改时间缓存MD5，续传时不必重新计算；
+    上传完成的文件保留记录，用于判断文件是否已上传
+    """
+
+    def __init__(self, path: str, max_age: float = 7 * 24 * 3600, save_interval: float = 1.0):
+        """
+        :param path: 台账文件路径
+        :param max_age: 未完成上传记录的保留时间（秒），超时的记录在加载时丢弃
+        :param save_interval: 分片确认写入文件的最小间隔（秒），中断时最多重传这段时间内确认的分片
+        """
+        self.path = path
+        self.max_age = max_age
+        self.save_interval = save_interval
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._dirty = False
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            self.logger.error(f"读取上传台账失败: {e}")
+            return
+        now = time.time()
+        self.entries = {md5: entry for md5, entry in entries.items()
+                        if entry.get("completed_at") or now - entry.get("updated_at", 0) <= self.max_age}
+
+    def _save(self):
+        """原子写入台账文件"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.error(f"保存上传台账失败: {e}")
+
+    def flush(self):
+        """写入尚未保存的分片确认"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def find_md5(self, file_path: str, stat: os.stat_result) -> Optional[str]:
+        """查找同一文件（路径、大小、修改时间均一致）已计算的MD5"""
+        with self._lock:
+            self._load()
+            for md5, entry in self.entries.items():
+                if (entry["file_path"] == os.path.abspath(file_path) and entry["size"] == stat.st_size
+                        and entry["mtime_ns"] == stat.st_mtime_ns):
+                    return md5
+        return None
+
+    def begin(self, file_md5: str, file_path: str, stat: os.stat_result, base_url: str,
+              chunk_size: int, total_chunks: int) -> List[int]:
+        """
+        开始或继续上传
+        服务地址或分片大小变化、或文件已上传完成（重新上传）时已确认的分片作废
+        :return: 已确认的分片序号
+        """
+        with self._lock:
+            self._load()
+            entry = self.entries.get(file_md5)
+            if (entry is None or entry.get("completed_at") or entry["base_url"] != base_url
+                    or entry["chunk_size"] != chunk_size):
+                entry = self.entries[file_md5] = {"acked": []}
+            entry.update(
+                file_path=os.path.abspath(file_path),
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                base_url=base_url,
+                chunk_size=chunk_size,
+                total_chunks=total_chunks,
+                updated_at=time.time(),
+            )
+            self._save()
+            return list(entry["acked"])
+
+    def ack(self, file_md5: str, index: int):
+        """记录服务端已确认的分片"""
+        with self._lock:
+            entry = self.entries.get(file_md5)
+            if entry is None:
+                return
+            entry["acked"].append(index)
+            entry["updated_at"] = time.time()
+            self._dirty = True
+            if time.monotonic() - self._saved_at >= self.save_interval:
+                self._save()
+
+    def acked(self, file_md5: str) -> List[int]:
+        """已确认的分片序号"""
+        with self._lock:
+            entry = self.entries.get(file_md5)
+            return list(entry["acked"]) if entry else []
+
+    def finish(self, file_md5: str, remote_path: Optional[str] = None):
+        """记录上传完成"""
+        with self._lock:
+            entry = self.entries.get(file_md5)
+            if entry is None:
+                return
+            entry.update(acked=[], completed_at=time.time(), remote_path=remote_path, updated_at=time.time())
+            self._save()
+
+    def discard(self, file_md5: str):
+        """服务端分片失效时移除记录"""
+        with self._lock:
+            self._load()
+            if self.entries.pop(file_md5, None) is not None:
+                self._save()
+
+    def uploaded(self, file_path: str, stat: os.stat_result, base_url: str) -> Optional[Dict[str, Any]]:
+        """文件（路径、大小、修改时间均一致）已上传到base_url时返回上传记录"""
+        with self._lock:
+            self._load()
+            for md5, entry in self.entries.items():
+                if (entry.get("completed_at") and entry["base_url"] == base_url
+                        and entry["file_path"] == os.path.abspath(file_path)
+                        and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns):
+                    return dict(entry, file_md5=md5)
+        return None
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """未完成的上传"""
+        with self._lock:
+            self._load()
+            return [
+                {"file_md5": md5, "file_path": entry["file_path"], "total_chunks": entry["total_chunks"],
+                 "acked_chunks": len(entry["acked"]), "updated_at": entry["updated_at"]}
+                for md5, entry in self.entries.items() if not entry.get("completed_at")
+            ]
+
+
+class ChunkedUploader:
+    """
+    view_hdf5分片上传
+    先流式计算文件MD5，再由多个线程按需从磁盘读取分片并通过连接池并行上传，
+    内存中最多同时存在 max_in_flight 个分片，与文件大小无关；
+    失败的分片单独按指数退避重试，配置台账时记录已确认的分片，中断的上传下次从断点继续
+    """
+
+    def __init__(self, chunk_size: int = 5 * 1024 * 1024, max_in_flight: int = 4, timeout: float = 30.0,
+                 ledger: Optional[UploadLedger] = None, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 limiter: Optional[BandwidthLimiter] = None):
+        """
+        :param chunk_size: 分片大小（字节）
+        :param max_in_flight: 同时上传的分片数
+        :param timeout: 单个请求超时时间（秒）
+        :param ledger: 上传台账，为None时不支持断点续传
+        :param max_retries: 单个分片失败后的最大重试次数
+        :param backoff_base: 重试退避的初始间隔（秒），每次重试翻倍
+        :param backoff_max: 重试退避的最大间隔（秒）
+        :param limiter: 总带宽限速器，为None时不限速
+        """
+        self.chunk_size = chunk_size
+        self.max_in_flight = max(1, max_in_flight)
+        self.timeout = timeout
+        self.ledger = ledger
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = limiter
+        self._session: Optional[requests.Session] = None
+        self._session_lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def _get_session(self) -> requests.Session:
+        """复用HTTP连接的会话，连接池大小与并行分片数一致"""
+        with self._session_lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.max_in_flight)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def file_md5(self, file_path: str, buffer_size: int = 1024 * 1024) -> str:
+        """使用固定大小的缓冲区流式计算MD5"""
+        md5 = hashlib.md5()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(buffer_size), b""):
+                md5.update(block)
+        return md5.hexdigest()
+
+    def read_chunk(self, file_path: str, index: int) -> bytes:
+        """从磁盘读取指定分片"""
+        with open(file_path, "rb") as f:
+            f.seek(index * self.chunk_size)
+            return f.read(self.chunk_size)
+
+    def upload_chunk(self, upload_url: str, file_path: str, file_md5: str, filename: str,
+                     index: int, total_chunks: int) -> int:
+        """
+        读取并上传单个分片，失败时抛出ChunkUploadError
+        :return: 分片字节数
+        """
+        data = self.read_chunk(file_path, index)
+        fields = [
+            ("file_md5", file_md5),
+            ("filename", filename),
+            ("chunk_index", str(index)),
+            ("total_chunks", str(total_chunks)),
+            ("chunk", ("chunk", data)),
+        ]
+        body, content_type = encode_multipart_formdata(fields)
+        if self.limiter is not None:
+            # 请求体按块限速发送，避免整块突发占满上行带宽
+            body = _ThrottledBody(body, self.limiter)
+        try:
+            resp = self._get_session().post(upload_url, data=body, headers={"Content-Type": content_type},
+                                            timeout=self.timeout)
+        except requests.RequestException as e:
+            raise ChunkUploadError(f"upload chunk {index} failed: {e}") from e
+        if resp.status_code != 200:
+            # 4xx表示请求本身有问题，重试无意义（超时和限流除外）
+            retryable = resp.status_code >= 500 or resp.status_code in (408, 429)
+            raise ChunkUploadError(f"upload chunk {index} failed: {resp.text}", retryable=retryable)
+        try:
+            resp_json = resp.json()
+        except Exception:
+            raise ChunkUploadError(f"upload chunk {index} failed: invalid response")
+        if not resp_json.get("success"):
+            raise ChunkUploadError(f"upload chunk {index} failed: {resp_json}")
+        return len(data)
+
+    def upload_chunk_with_retry(self, upload_url: str, file_path: str, file_md5: str, filename: str,
+                                index: int, total_chunks: int, cancelled: threading.Event,
+                                on_progress: Optional[Callable[[int, bool], None]] = None) -> int:
+        """
+        上传单个分片，失败时按指数退避（带随机抖动）重试
+        :param cancelled: 其他分片最终失败时置位，停止重试
+        :param on_progress: 分片被确认后调用，参数为 (分片字节数, False)
+        :return: 重试次数
+        """
+        attempt = 0
+        while True:
+            try:
+                nbytes = self.upload_chunk(upload_url, file_path, file_md5, filename, index, total_chunks)
+            except ChunkUploadError as e:
+                if not e.retryable or attempt >= self.max_retries or cancelled.is_set():
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                attempt += 1
+                self.logger.warning(f"{e}，{delay:.1f}秒后第{attempt}次重试")
+                if cancelled.wait(delay):
+                    raise
+                continue
+            if self.ledger is not None:
+                self.ledger.ack(file_md5, index)
+            if on_progress is not None:
+                on_progress(nbytes, False)
+            return attempt
+
+    def merge(self, merge_url: str, file_md5: str, filename: str, total_chunks: int) -> Dict[str, Any]:
+        """通知服务端合并分片"""
+        payload = {"file_md5": file_md5, "filename": filename, "total_chunks": total_chunks}
+        try:
+            resp = self._get_session().post(merge_url, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise ChunkUploadError(f"merge failed: {e}") from e
+        if resp.status_code != 200:
+            raise ChunkUploadError(f"merge failed: {resp.text}")
+        try:
+            merge_json = resp.json()
+        except Exception:
+            raise ChunkUploadError("merge failed: invalid response")
+        if not merge_json.get("success"):
+            raise ChunkUploadError(f"merge failed: {merge_json}")
+        return merge_json
+
+    def upload(self, file_path: str, base_url: str,
+               on_progress: Optional[Callable[[int, bool], None]] = None,
+               file_md5: Optional[str] = None, md5_stat: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+        """
+        上传文件到view_hdf5，台账中有同一文件的未完成上传时只发送未确认的分片
+        :param base_url: view_hdf5服务地址
+        :param on_progress: 分片被确认时在上传线程中调用，参数为 (新确认的字节数, 是否为续传跳过的分片)，
+                            续传跳过的分片在开始时一次报告
+        :param file_md5: 已知的文件MD5（如转换时计算的），提供时不再读取整个文件计算
+        :param md5_stat: 计算file_md5时文件的 (大小, mtime_ns)，文件此后被修改过时丢弃file_md5重新计算
+        :return: {"success": true, "file_path": ..., "filename": ..., "total_chunks": ..., "file_md5": ...,
+                  "resumed_chunks": 续传时跳过的分片数, "retries": 分片重试总次数}
+        """
+        if not os.path.exists(file_path):
+            return {"success": False, "message": f"file not found: {file_path}"}
+
+        upload_url = f"{base_url}/api/upload_chunk"
+        merge_url = f"{base_url}/api/merge_chunks"
+        filename = os.path.basename(file_path)
+        stat = os.stat(file_path)
+        total_chunks = (stat.st_size + self.chunk_size - 1) // self.chunk_size
+        if file_md5 is not None and md5_stat is not None and tuple(md5_stat) != (stat.st_size, stat.st_mtime_ns):
+            file_md5 = None
+        if file_md5 is None and self.ledger is not None:
+            file_md5 = self.ledger.find_md5(file_path, stat)
+        if file_md5 is None:
+            file_md5 = self.file_md5(file_path)
+        acked = set()
+        if self.ledger is not None:
+            acked = set(self.ledger.begin(file_md5, file_path, stat, base_url, self.chunk_size, total_chunks))
+        pending = [index for index in range(total_chunks) if index not in acked]
+        retries = 0
+        if acked and on_progress is not None:
+            on_progress(stat.st_size - sum(min(self.chunk_size, stat.st_size - index * self.chunk_size)
+                                           for index in pending), True)
+
+        cancelled = threading.Event()
+        try:
+            # 线程数即在途分片数：分片在工作线程中读取，上传完成后即释放
+            with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="upload") as pool:
+                futures = [
+                    pool.submit(self.upload_chunk_with_retry, upload_url, file_path, file_md5, filename,
+                                index, total_chunks, cancelled, on_progress)
+                    for index in pending
+                ]
+                try:
+                    for future in as_completed(futures):
+                        retries += future.result()
+                except BaseException:
+                    cancelled.set()
+                    for future in futures:
+                        future.cancel()
+                    raise
+        except ChunkUploadError as e:
+            result = {"success": False, "message": str(e)}
+            if self.ledger is not None:
+                # 已确认的分片保留在台账中，下次从断点继续
+                self.ledger.flush()
+                result.update(file_md5=file_md5, total_chunks=total_chunks,
+                              uploaded_chunks=len(self.ledger.acked(file_md5)))
+            return result
+
+        try:
+            merge_json = self.merge(merge_url, file_md5, filename, total_chunks)
+        except ChunkUploadError as e:
+            if self.ledger is not None:
+                if acked:
+                    # 服务端可能已清理之前的分片，丢弃续传记录，下次完整上传
+                    self.ledger.discard(file_md5)
+                else:
+                    self.ledger.flush()
+            return {"success": False, "message": str(e)}
+        if self.ledger is not None:
+            self.ledger.finish(file_md5, merge_json.get("file_path"))
+
+        return {
+            "success": True,
+            "file_path": merge_json.get("file_path"),
+            "filename": merge_json.get("filename", filename),
+            "total_chunks": total_chunks,
+            "file_md5": file_md5,
+            "resumed_chunks": len(acked),
+            "retries": retries,
+        }
@@ -0,0 +1,108 @@
+import time
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Callable, Any, Optional, Iterable
+
+
+class HardwareExecutor:
+    """
+    硬件操作执行器
+    在独立线程池中执行阻塞的设备SDK调用（构造、start/stop、设备扫描等），避免阻塞事件循环；
+    非线程安全的SDK可按类别串行执行
+    """
+
+    def __init__(self, max_workers: int = 8, serial_categories: Optional[Iterable[str]] = None):
+        """
+        :param max_workers: 线程池大小
+        :param serial_categories: 需要串行执行的类别，同一类别的操作按提交顺序逐个执行
+        """
+        self.max_workers = max_workers
+        self.serial_categories = set(serial_categories or [])
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hardware")
+        self._category_locks: Dict[str, asyncio.Lock] = {}
+        # 按类别统计调用次数、失败次数和耗时
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.logger = logging.getLogger(__name__)
+
+    def _get_lock(self, category: str) -> Optional[asyncio.Lock]:
+        """获取串行类别对应的锁，非串行类别返回None"""
+        if category not in self.serial_categories:
+            return None
+        lock = self._category_locks.get(category)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._category_locks[category] = lock
+        return lock
+
+    def _record(self, category: str, started_at: float, future: asyncio.Future):
+        """记录一次操作的统计"""
+        stats = self.stats.setdefault(category, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+        elapsed = (time.perf_counter() - started_at) * 1000.0
+        stats["calls"] += 1
+        stats["total_ms"] += elapsed
+        stats["max_ms"] = max(stats["max_ms"], elapsed)
+        if future.cancelled() or future.exception() is not None:
+            stats["errors"] += 1
+
+    async def submit(self, category: str, func: Callable[..., Any], *args, **kwargs) -> asyncio.Future:
+        """
+        提交硬件操作
+        串行类别会先排队等待同类操作完成，类别锁在线程实际执行结束后才释放
+        :return: 操作结果的Future
+        """
+        lock = self._get_lock(category)
+        if lock is not None:
+            await lock.acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            started_at = time.perf_counter()
+            future = loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        except BaseException:
+            if lock is not None:
+                lock.release()
+            raise
+        future.add_done_callback(functools.partial(self._record, category, started_at))
+        if lock is not None:
+            future.add_done_callback(lambda _: lock.release())
+        return future
+
+    async def run(self, category: str, func: Callable[..., Any], *args, timeout: Optional[float] = None,
+                  on_late_result: Optional[Callable[[asyncio.Future], None]] = None, **kwargs) -> Any:
+        """
+        执行硬件操作并等待结果
+        超时包含串行类别排队等待的时间；排队期间超时的操作不再执行，
+        已开始的操作超时或调用方取消时仍会在线程中执行完毕（线程无法被中断）
+        :param category: 操作类别，如设备类别
+        :param func: 阻塞函数
+        :param timeout: 等待超时时间（秒），None表示一直等待
+        :param on_late_result: 已开始的操作超时或被取消后，以该操作的Future注册为完成回调，用于清理迟到的结果
+        :return: 函数返回值
+        """
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+        future = await asyncio.wait_for(self.submit(category, func, *args, **kwargs), timeout=timeout)
+        remaining = None if timeout is None else max(0.0, timeout - (loop.time() - started_at))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=remaining)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if on_late_result is not None:
+                future.add_done_callback(on_late_result)
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各类别的调用统计"""
+        categories = {}
+        for category, stats in self.stats.items():
+            calls = stats["calls"]
+            categories[category] = dict(stats, avg_ms=stats["total_ms"] / calls if calls else 0.0)
+        return {
+            "max_workers": self.max_workers,
+            "serial_categories": sorted(self.serial_categories),
+            "categories": categories,
+        }
+
+    def shutdown(self, wait: bool = False):
+        """关闭线程池"""
+        self._executor.shutdown(wait=wait)
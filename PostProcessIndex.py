@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, Any, Optional
+
+
+class SessionIndex:
+    """
+    后处理索引
+    记录每个会话转换时的源数据指纹（文件相对路径、大小、修改时间，可选内容哈希）和输出文件信息，
+    用于判断会话是否需要重新转换；索引文件保存在输出目录下
+    """
+
+    FILENAME = ".postprocess_index.json"
+
+    def __init__(self, output_dir: str):
+        """
+        :param output_dir: HDF5输出目录
+        """
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, self.FILENAME)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.logger = logging.getLogger(__name__)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            self.logger.error(f"读取后处理索引失败: {e}")
+
+    def _save(self):
+        """原子写入索引文件"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.error(f"保存后处理索引失败: {e}")
+
+    def output_file(self, session_id: str) -> str:
+        return os.path.join(self.output_dir, f"{session_id}.hdf5")
+
+    def _output_intact(self, entry: Dict[str, Any], session_id: str) -> bool:
+        """输出文件存在且大小与记录一致"""
+        try:
+            return os.path.getsize(self.output_file(session_id)) == entry.get("output_size")
+        except OSError:
+            return False
+
+    def status(self, session_id: str, scan: Optional[Dict[str, Any]] = None) -> str:
+        """
+        获取会话状态
+        :param scan: scan_session的结果，提供时比较源数据指纹，否则只检查索引和输出文件
+        :return: new-未转换, converted-已转换且未变化, modified-源数据有变化, output_missing-输出文件缺失或被修改
+        """
+        entry = self.entries.get(session_id)
+        if entry is None:
+            return "new"
+        if not self._output_intact(entry, session_id):
+            return "output_missing"
+        if scan is not None:
+            if scan["fingerprint"] != entry.get("fingerprint"):
+                return "modified"
+            # 两边都计算了内容哈希时才比较
+            if scan.get("content_hash") and entry.get("content_hash") and scan["content_hash"] != entry["content_hash"]:
+                return "modified"
+        return "converted"
+
+    def record(self, session_id: str, scan: Dict[str, Any], output_md5: Optional[str] = None):
+        """
+        记录会话的转换结果
+        :param output_md5: 转换后计算的输出文件MD5
+        """
+        output_file = self.output_file(session_id)
+        try:
+            output_stat = os.stat(output_file)
+        except OSError:
+            # 没有可转换的数据时不会生成输出文件，不记录
+            self.entries.pop(session_id, None)
+            self._save()
+            return
+        self.entries[session_id] = {
+            "fingerprint": scan["fingerprint"],
+            "content_hash": scan.get("content_hash"),
+            "files": scan["files"],
+            "bytes": scan["bytes"],
+            "frames": scan["frames"],
+            "latest_mtime": scan["latest_mtime"],
+            "output_size": output_stat.st_size,
+            "output_mtime_ns": output_stat.st_mtime_ns,
+            "output_md5": output_md5,
+            "processed_at": time.time(),
+        }
+        self._save()
+
+    def output_md5(self, session_id: str) -> Optional[str]:
+        """记录的输出文件MD5，输出文件在记录后被修改过时返回None"""
+        entry = self.entries.get(session_id)
+        if not entry or not entry.get("output_md5"):
+            return None
+        try:
+            stat = os.stat(self.output_file(session_id))
+        except OSError:
+            return None
+        if stat.st_size != entry.get("output_size") or stat.st_mtime_ns != entry.get("output_mtime_ns"):
+            return None
+        return entry["output_md5"]
+
+    def forget(self, session_id: str):
+        if self.entries.pop(session_id, None) is not None:
+            self._save()
+
+    def describe(self, session_id: str, scan: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """会话状态及索引中记录的信息"""
+        entry = self.entries.get(session_id) or {}
+        return {
+            "status": self.status(session_id, scan),
+            "processed_at": entry.get("processed_at"),
+            "output_file": self.output_file(session_id) if entry else None,
+            "output_size": entry.get("output_size"),
+            "frames": entry.get("frames"),
+        }
+
+
+def scan_session(temp_dir: str, session_id: str, content_hash: bool = False) -> Dict[str, Any]:
+    """
+    统计会话目录并计算源数据指纹
+    :param content_hash: 是否同时计算所有文件内容的哈希（需要读取全部数据）
+    :return: {"bytes": 总大小, "frames": 图像帧数, "files": 文件数, "latest_mtime": 最新修改时间,
+              "fingerprint": 路径/大小/修改时间的哈希, "content_hash": 内容哈希或None}
+    """
+    session_path = os.path.join(temp_dir, session_id)
+    records = []
+    for root, _, files in os.walk(session_path):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            records.append((os.path.relpath(path, session_path), stat.st_size, stat.st_mtime_ns))
+    records.sort()
+
+    fingerprint = hashlib.sha1()
+    for rel_path, size, mtime_ns in records:
+        fingerprint.update(f"{rel_path}\0{size}\0{mtime_ns}\n".encode("utf-8"))
+
+    digest = None
+    if content_hash:
+        content = hashlib.sha1()
+        for rel_path, _, _ in records:
+            content.update(rel_path.encode("utf-8"))
+            try:
+                with open(os.path.join(session_path, rel_path), "rb") as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b""):
+                        content.update(block)
+            except OSError:
+                continue
+        digest = content.hexdigest()
+
+    return {
+        "bytes": sum(size for _, size, _ in records),
+        "frames": sum(1 for rel_path, _, _ in records if os.path.basename(rel_path).startswith("frame_")),
+        "files": len(records),
+        "latest_mtime": max((mtime_ns for _, _, mtime_ns in records), default=0) / 1e9,
+        "fingerprint": fingerprint.hexdigest(),
+        "content_hash": digest,
+    }
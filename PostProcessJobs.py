@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from typing import Dict, Any, Optional, List, Set, Callable, Awaitable
+
+from PostProcessScheduler import PostProcessScheduler
+
+
+class PostProcessJobQueue:
+    """
+    后处理任务队列
+    入队后立即返回任务ID，任务在后台由PostProcessScheduler执行；
+    任务状态持久化到JSON文件，节点重启后未完成的任务重新排队；
+    进度、吞吐量和完成结果通过notify回调推送；
+    取消运行中的任务时，任务保持cancelling状态，直到工作进程结束、不再写输出文件
+    """
+
+    FINISHED = ("succeeded", "failed", "cancelled")
+
+    def __init__(self, scheduler: PostProcessScheduler, state_file: str,
+                 notify: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+                 progress_interval: float = 1.0, max_history: int = 200):
+        """
+        :param scheduler: 后处理调度器
+        :param state_file: 任务状态文件路径
+        :param notify: 异步通知回调，参数为 (事件名, 任务信息)，事件名为 job_progress / job_finished
+        :param progress_interval: 进度通知的最小间隔（秒）
+        :param max_history: 保留的已结束任务数
+        """
+        self.scheduler = scheduler
+        self.state_file = state_file
+        self.notify = notify
+        self.progress_interval = progress_interval
+        self.max_history = max_history
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # 通知等后台任务，保持引用直到完成
+        self._background_tasks: Set[asyncio.Task] = set()
+        self._started = False
+        self.logger = logging.getLogger(__name__)
+
+    def load(self):
+        """读取任务状态文件，中断的任务重新排队"""
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                jobs = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            self.logger.error(f"读取后处理任务状态失败: {e}")
+            return
+        for job in jobs:
+            if job.get("status") == "running":
+                job["status"] = "queued"
+                job["progress"] = 0.0
+            elif job.get("status") == "cancelling":
+                # 工作进程已随节点退出
+                job.update(status="cancelled", finished_at=job.get("finished_at") or time.time())
+            self.jobs[job["id"]] = job
+
+    def _save(self):
+        """原子写入任务状态文件"""
+        finished = [job for job in self.jobs.values() if job["status"] in self.FINISHED]
+        for job in sorted(finished, key=lambda j: j.get("finished_at") or 0)[:-self.max_history or None]:
+            del self.jobs[job["id"]]
+        directory = os.path.dirname(self.state_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_file}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(list(self.jobs.values()), f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_file)
+        except OSError as e:
+            self.logger.error(f"保存后处理任务状态失败: {e}")
+
+    def start(self):
+        """加载持久化的任务并开始执行排队中的任务（需在事件循环中调用）"""
+        if self._started:
+            return
+        self._started = True
+        self.load()
+        for job in sorted(self.jobs.values(), key=lambda j: j["created_at"]):
+            if job["status"] == "queued":
+                self._schedule(job)
+        self._save()
+
+    def enqueue(self, session_id: str, temp_dir: str, output_dir: str, force: bool = False,
+                content_hash: bool = False) -> Dict[str, Any]:
+        """
+        提交会话转换任务
+        同一会话已有排队中或运行中的任务时直接返回该任务；
+        已有取消中的任务时新任务排队，等取消的转换结束后再开始
+        :param force: 为False时源数据未变化的会话直接完成（skipped为true），不重新转换
+        :param content_hash: 源数据指纹中包含文件内容哈希
+        """
+        for job in self.jobs.values():
+            if job["session"] == session_id and job["status"] in ("queued", "running"):
+                return job
+        job = {
+            "id": uuid.uuid4().hex,
+            "session": session_id,
+            "status": "queued",
+            "temp_dir": temp_dir,
+            "output_dir": output_dir,
+            "force": force,
+            "content_hash": content_hash,
+            "skipped": False,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": 0.0,
+            "frames": 0,
+            "total_frames": None,
+            "bytes": 0,
+            "total_bytes": None,
+            "fps": 0.0,
+            "mb_per_s": 0.0,
+            "output_file": None,
+            "message": None,
+        }
+        self.jobs[job["id"]] = job
+        self._save()
+        if self._started:
+            self._schedule(job)
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        取消任务
+        排队中的任务直接取消；运行中的任务在工作进程中无法中断，
+        先进入cancelling状态，转换结束后丢弃结果并标记为cancelled
+        :return: 任务信息，任务不存在时返回None
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        if job["status"] in self.FINISHED or job["status"] == "cancelling":
+            return job
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+        if job["status"] == "running":
+            job.update(status="cancelling", message="cancelled by request")
+            self._save()
+            self._emit("job_progress", job)
+            self._schedule_cancelled(job)
+        else:
+            self._finish(job, "cancelled", message="cancelled by request")
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.jobs.get(job_id)
+
+    def list(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        jobs = sorted(self.jobs.values(), key=lambda j: j["created_at"])
+        if status:
+            jobs = [job for job in jobs if job["status"] == status]
+        return jobs
+
+    def _schedule(self, job: Dict[str, Any]):
+        self._track(job["id"], asyncio.ensure_future(self._run(job)))
+
+    def _schedule_cancelled(self, job: Dict[str, Any]):
+        self._track(job["id"], asyncio.ensure_future(self._wait_cancelled(job)))
+
+    def _track(self, job_id: str, task: asyncio.Task):
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda t: self._tasks.pop(job_id) if self._tasks.get(job_id) is t else None)
+
+    async def _wait_cancelled(self, job: Dict[str, Any]):
+        """等待已取消任务的工作进程结束"""
+        await self.scheduler.wait_session(job["output_dir"], job["session"])
+        self._finish(job, "cancelled", message="cancelled by request")
+
+    async def _run(self, job: Dict[str, Any]):
+        last_notified = 0.0
+
+        def on_start(info: Dict[str, Any]):
+            job.update(status="running", started_at=time.time(),
+                       total_frames=info["total_frames"], total_bytes=info["total_bytes"])
+            self._save()
+            self._emit("job_progress", job)
+
+        def on_progress(frames: int, nbytes: int):
+            nonlocal last_notified
+            if job["status"] != "running":
+                return
+            elapsed = time.time() - job["started_at"]
+            total_frames = job["total_frames"]
+            job.update(
+                frames=frames,
+                bytes=nbytes,
+                # 以读取的帧数估算进度，写入HDF5前保持在1以下
+                progress=round(min(frames / total_frames, 0.99), 4) if total_frames else 0.0,
+            )
+            # 刚开始时间太短，吞吐量没有意义
+            if elapsed >= 0.5:
+                job.update(fps=round(frames / elapsed, 2), mb_per_s=round(nbytes / elapsed / (1024 * 1024), 3))
+            now = time.monotonic()
+            if now - last_notified >= self.progress_interval:
+                last_notified = now
+                self._emit("job_progress", job)
+
+        try:
+            result = await self.scheduler.process(job["temp_dir"], job["output_dir"], job["session"],
+                                                  on_start=on_start, on_progress=on_progress,
+                                                  skip_unchanged=not job.get("force", False),
+                                                  content_hash=job.get("content_hash", False))
+        except Exception as e:
+            result = {"success": False, "message": str(e)}
+        if job["status"] in self.FINISHED or job["status"] == "cancelling":
+            return
+        if result.get("skipped"):
+            job.update(output_file=result["output_file"], progress=1.0, skipped=True,
+                       total_frames=result["total_frames"], total_bytes=result["total_bytes"])
+            self._finish(job, "succeeded", message="unchanged since last conversion")
+        elif result["success"]:
+            duration = max(result["duration_ms"] / 1000.0, 1e-6)
+            frames = result.get("frames_read", job["frames"])
+            nbytes = result.get("bytes_read", job["bytes"])
+            job.update(
+                output_file=result["output_file"],
+                progress=1.0,
+                frames=frames,
+                bytes=nbytes,
+                fps=round(frames / duration, 2),
+                mb_per_s=round(nbytes / duration / (1024 * 1024), 3),
+            )
+            self._finish(job, "succeeded")
+        else:
+            self._finish(job, "failed", message=result["message"])
+
+    def _finish(self, job: Dict[str, Any], status: str, message: Optional[str] = None):
+        job.update(status=status, finished_at=time.time(), message=message)
+        self._save()
+        self._emit("job_finished", job)
+
+    def _spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        """创建后台任务并保持引用"""
+        task = asyncio.ensure_future(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    def _emit(self, event: str, job: Dict[str, Any]):
+        if self.notify is None:
+            return
+        payload = {k: v for k, v in job.items() if k not in ("temp_dir", "output_dir")}
+        self._spawn(self.notify(event, payload))
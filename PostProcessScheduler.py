@@ -0,0 +1,372 @@
+import os
+import time
+import uuid
+import queue
+import hashlib
+import functools
+import asyncio
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional, List, Set, AsyncIterator, Awaitable, Callable, Tuple
+
+from PostProcessIndex import SessionIndex, scan_session
+
+
+class _CountingImage:
+    """代理PIL.Image模块，统计工作进程中读取的图像帧数和字节数"""
+
+    def __init__(self, image_module: Any, on_open: Callable[[Any], None]):
+        self._image_module = image_module
+        self._on_open = on_open
+
+    def open(self, fp, *args, **kwargs):
+        self._on_open(fp)
+        return self._image_module.open(fp, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._image_module, name)
+
+
+def _file_md5(path: str, buffer_size: int = 1024 * 1024) -> Optional[str]:
+    """流式计算文件MD5，文件不存在时返回None"""
+    md5 = hashlib.md5()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(buffer_size), b""):
+                md5.update(block)
+    except FileNotFoundError:
+        return None
+    return md5.hexdigest()
+
+
+def _process_session(temp_dir: str, output_dir: str, session_id: str,
+                     progress_queue: Any = None, token: Optional[str] = None,
+                     progress_interval: float = 0.5,
+                     hash_output: bool = False) -> Tuple[float, Optional[int], Optional[int], Optional[str]]:
+    """
+    在工作进程中将会话转换为HDF5
+    :param progress_queue: 进度队列，定期写入 (token, 已读帧数, 已读字节数)
+    :param hash_output: 转换后立即计算输出文件MD5，此时文件内容还在页缓存中，上传时无需再次读取整个文件
+    :return: (转换耗时秒, 读取帧数, 读取字节数, 输出文件MD5)，未统计进度时帧数和字节数为None，未计算时MD5为None
+    """
+    from TypeRegistry import import_easyteleop
+
+    PostProcess = import_easyteleop("EasyTeleop.Components.PostProcess")
+
+    started = time.perf_counter()
+    processor = PostProcess.DataPostProcessor(temp_dir=temp_dir, output_dir=output_dir)
+
+    def output_md5() -> Optional[str]:
+        # HDF5写入时会回写文件头，无法边写边计算，只能在关闭文件后计算
+        return _file_md5(os.path.join(output_dir, f"{session_id}.hdf5")) if hash_output else None
+
+    # 通过替换PostProcess模块内引用的Image统计读取的帧，EasyTeleop不再以Image名称引用PIL时不统计
+    image_module = getattr(PostProcess, "Image", None)
+    if progress_queue is None or image_module is None:
+        processor.process_session_to_hdf5(session_id, None)
+        return time.perf_counter() - started, None, None, output_md5()
+
+    state = {"frames": 0, "bytes": 0, "reported_at": 0.0}
+
+    def on_open(fp):
+        state["frames"] += 1
+        try:
+            state["bytes"] += os.path.getsize(fp)
+        except (OSError, TypeError):
+            pass
+        now = time.monotonic()
+        if now - state["reported_at"] >= progress_interval:
+            state["reported_at"] = now
+            progress_queue.put((token, state["frames"], state["bytes"]))
+
+    # 工作进程一次只处理一个会话，替换不会影响其他转换
+    PostProcess.Image = _CountingImage(image_module, on_open)
+    try:
+        processor.process_session_to_hdf5(session_id, None)
+    finally:
+        PostProcess.Image = image_module
+    return time.perf_counter() - started, state["frames"], state["bytes"], output_md5()
+
+
+def _available_memory() -> Optional[int]:
+    """读取系统可用内存（字节），无法获取时返回None"""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+class PostProcessScheduler:
+    """
+    后处理调度器
+    在进程池中并行转换会话，按会话数据量估算内存占用，超出内存预算时排队等待，
+    避免多个大会话同时加载；按提交顺序准入，每个会话完成后立即返回结果；
+    转换成功后把源数据指纹记入输出目录的索引，增量模式下跳过未变化的会话
+    """
+
+    def __init__(self, max_workers: int = 0, memory_budget: int = 0, memory_factor: float = 2.0):
+        """
+        :param max_workers: 工作进程数，<=0表示使用CPU核数
+        :param memory_budget: 同时处理的会话估算内存上限（字节），<=0表示取启动时可用内存的一半
+        :param memory_factor: 会话内存估算系数，估算内存 = 会话数据大小 * 系数
+        """
+        self.max_workers = max_workers if max_workers > 0 else (os.cpu_count() or 1)
+        self.memory_budget = memory_budget
+        self.memory_factor = memory_factor
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cond: Optional[asyncio.Condition] = None
+        # 等待准入的会话，只有队首可以被准入
+        self._waiting: deque = deque()
+        self._active = 0
+        self._reserved = 0
+        self.stats: Dict[str, int] = {"completed": 0, "failed": 0, "pool_restarts": 0}
+        # 工作进程通过Manager队列上报进度，由后台线程转发到事件循环
+        self._manager = None
+        self._progress_queue = None
+        self._progress_callbacks: Dict[str, Callable[[int, int], None]] = {}
+        # 输出目录 -> 索引
+        self._indexes: Dict[str, SessionIndex] = {}
+        # (输出目录, 会话ID) -> 该会话的转换结束时完成的future，同一会话同时只有一个转换写输出文件
+        self._sessions: Dict[tuple, asyncio.Future] = {}
+        # 取消后等待工作进程结束的清理任务，保持引用直到完成
+        self._background_tasks: Set[asyncio.Task] = set()
+        self.logger = logging.getLogger(__name__)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 节点进程中有MQTT、遥测等线程，使用spawn避免fork后继承锁状态
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _get_progress_queue(self):
+        if self._progress_queue is None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+            self._progress_queue = self._manager.Queue()
+            loop = asyncio.get_running_loop()
+            threading.Thread(target=self._pump_progress, args=(self._progress_queue, loop),
+                             name="postprocess-progress", daemon=True).start()
+        return self._progress_queue
+
+    def _pump_progress(self, progress_queue, loop: asyncio.AbstractEventLoop):
+        """把工作进程的进度转发到事件循环线程"""
+        while True:
+            try:
+                token, frames, nbytes = progress_queue.get()
+            except (EOFError, OSError):
+                return
+            except queue.Empty:
+                continue
+            if token is None:
+                return
+            callback = self._progress_callbacks.get(token)
+            if callback is not None:
+                loop.call_soon_threadsafe(callback, frames, nbytes)
+
+    def get_index(self, output_dir: str) -> SessionIndex:
+        """获取输出目录对应的索引"""
+        key = os.path.abspath(output_dir)
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = SessionIndex(output_dir)
+        return index
+
+    def _get_budget(self) -> Optional[int]:
+        if self.memory_budget <= 0:
+            available = _available_memory()
+            self.memory_budget = available // 2 if available else 0
+        return self.memory_budget or None
+
+    def _fits(self, estimate: int) -> bool:
+        if self._active >= self.max_workers:
+            return False
+        budget = self._get_budget()
+        # 单个会话超过预算时，等其他会话结束后单独执行
+        return self._active == 0 or budget is None or self._reserved + estimate <= budget
+
+    async def _admit(self, estimate: int):
+        """按提交顺序等待准入"""
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        ticket = object()
+        async with self._cond:
+            self._waiting.append(ticket)
+            try:
+                await self._cond.wait_for(lambda: self._waiting[0] is ticket and self._fits(estimate))
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+            self._active += 1
+            self._reserved += estimate
+
+    async def _release(self, estimate: int):
+        async with self._cond:
+            self._active -= 1
+            self._reserved -= estimate
+            self._cond.notify_all()
+
+    def _spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        """创建后台任务并保持引用"""
+        task = asyncio.ensure_future(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    def _unlock_session(self, key: tuple, settled: asyncio.Future):
+        if self._sessions.get(key) is settled:
+            del self._sessions[key]
+        if not settled.done():
+            settled.set_result(None)
+
+    async def _settle(self, key: tuple, settled: asyncio.Future, estimate: int):
+        """已取消的转换在工作进程结束后解除会话占用并释放资源"""
+        self._unlock_session(key, settled)
+        await self._release(estimate)
+
+    async def wait_session(self, output_dir: str, session_id: str):
+        """等待会话当前的转换结束，包括已取消但工作进程仍在写输出文件的转换"""
+        key = (os.path.abspath(output_dir), session_id)
+        while key in self._sessions:
+            await asyncio.shield(self._sessions[key])
+
+    async def process(self, temp_dir: str, output_dir: str, session_id: str,
+                      on_start: Optional[Callable[[Dict[str, Any]], None]] = None,
+                      on_progress: Optional[Callable[[int, int], None]] = None,
+                      skip_unchanged: bool = False, content_hash: bool = False,
+                      hash_output: bool = False) -> Dict[str, Any]:
+        """
+        转换单个会话
+        :param on_start: 会话被准入、开始转换时调用，参数为会话统计
+        :param on_progress: 转换过程中定期调用，参数为 (已读帧数, 已读字节数)
+        :param skip_unchanged: 源数据与索引记录一致且输出文件完好时跳过转换，结果中skipped为true
+        :param content_hash: 指纹中包含文件内容哈希
+        :param hash_output: 在工作进程中计算输出文件MD5，结果中包含output_md5
+        :return: {"session": ..., "success": true, "output_file": ..., "duration_ms": ..., "estimated_memory": ...,
+                  "total_bytes": ..., "total_frames": ...}，统计进度时还包含 frames_read / bytes_read
+        """
+        # 同一会话已在转换时（包括已取消、工作进程仍在写输出文件的转换），等其结束后再开始
+        await self.wait_session(output_dir, session_id)
+        key = (os.path.abspath(output_dir), session_id)
+        settled = asyncio.get_running_loop().create_future()
+        self._sessions[key] = settled
+        unlock = True
+        release = False
+        token = None
+        try:
+            scan = await asyncio.to_thread(scan_session, temp_dir, session_id, content_hash)
+            index = self.get_index(output_dir)
+            estimate = int(scan["bytes"] * self.memory_factor)
+            result: Dict[str, Any] = {"session": session_id, "estimated_memory": estimate,
+                                      "total_bytes": scan["bytes"], "total_frames": scan["frames"]}
+            if skip_unchanged and index.status(session_id, scan) == "converted":
+                result.update(success=True, skipped=True, output_file=index.output_file(session_id), duration_ms=0.0)
+                if hash_output:
+                    result["output_md5"] = index.output_md5(session_id)
+                return result
+            queued_at = time.perf_counter()
+            await self._admit(estimate)
+            release = True
+            result["queue_ms"] = (time.perf_counter() - queued_at) * 1000.0
+            try:
+                if on_start is not None:
+                    on_start(dict(result))
+                loop = asyncio.get_running_loop()
+                executor = self._get_executor()
+                worker = functools.partial(_process_session, temp_dir, output_dir, session_id, hash_output=hash_output)
+                if on_progress is not None:
+                    token = uuid.uuid4().hex
+                    self._progress_callbacks[token] = on_progress
+                    worker = functools.partial(worker, progress_queue=self._get_progress_queue(), token=token)
+                future = loop.run_in_executor(executor, worker)
+                try:
+                    duration, frames_read, bytes_read, output_md5 = await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    # 工作进程中的转换无法中断，等其结束后再释放占用
+                    release = unlock = False
+                    future.add_done_callback(lambda _: self._spawn(self._settle(key, settled, estimate)))
+                    raise
+                except BrokenProcessPool:
+                    # 工作进程异常退出（如内存不足被杀），重建进程池
+                    if self._executor is executor:
+                        self._executor = None
+                        self.stats["pool_restarts"] += 1
+                        executor.shutdown(wait=False)
+                    raise
+                result.update(
+                    success=True,
+                    output_file=os.path.join(output_dir, f"{session_id}.hdf5"),
+                    duration_ms=duration * 1000.0,
+                )
+                if frames_read is not None:
+                    result.update(frames_read=frames_read, bytes_read=bytes_read)
+                if hash_output:
+                    result["output_md5"] = output_md5
+                # 记录转换前采集的指纹，转换期间源数据的变化会在下次比较时发现
+                index.record(session_id, scan, output_md5)
+                self.stats["completed"] += 1
+            except Exception as exc:
+                result.update(success=False, message=str(exc) or exc.__class__.__name__)
+                self.stats["failed"] += 1
+        finally:
+            if token is not None:
+                # 最后一次进度可能还在转发途中，稍后再移除回调
+                loop.call_later(1.0, self._progress_callbacks.pop, token, None)
+            if unlock:
+                self._unlock_session(key, settled)
+            if release:
+                await self._release(estimate)
+        return result
+
+    async def run(self, temp_dir: str, output_dir: str, session_ids: List[str],
+                  skip_unchanged: bool = False, content_hash: bool = False,
+                  hash_output: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """
+        并行转换多个会话，按完成顺序逐个返回结果
+        """
+        tasks = [
+            asyncio.ensure_future(self.process(temp_dir, output_dir, session_id,
+                                               skip_unchanged=skip_unchanged, content_hash=content_hash,
+                                               hash_output=hash_output))
+            for session_id in session_ids
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度状态"""
+        return dict(
+            self.stats,
+            max_workers=self.max_workers,
+            active=self._active,
+            waiting=len(self._waiting),
+            reserved_memory=self._reserved,
+            memory_budget=self.memory_budget,
+        )
+
+    def shutdown(self, wait: bool = False):
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._progress_queue.put((None, 0, 0))
+            self._manager.shutdown()
+            self._manager = None
+            self._progress_queue = None
@@ -0,0 +1,92 @@
+import time
+import asyncio
+from typing import Dict, Callable, Awaitable, Any, Optional, Tuple, Hashable
+
+
+class TTLCache:
+    """
+    带过期时间的异步结果缓存
+    同一键的并发加载只执行一次，其余调用等待同一结果
+    """
+
+    def __init__(self, ttl: float):
+        """
+        :param ttl: 缓存有效期（秒），<=0表示不缓存
+        """
+        self.ttl = ttl
+        # 键 -> (值, 写入时间)
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        # 正在加载的键
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """
+        读取未过期的缓存
+        :return: (值, 缓存时长秒)，不存在或已过期返回None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age > self.ttl:
+            self._entries.pop(key, None)
+            return None
+        return value, age
+
+    def set(self, key: Hashable, value: Any):
+        """写入缓存"""
+        if self.ttl > 0:
+            self._entries[key] = (value, time.monotonic())
+
+    def invalidate(self, key: Optional[Hashable] = None) -> int:
+        """
+        使缓存失效
+        :param key: 要失效的键，None表示全部
+        :return: 被移除的条目数
+        """
+        if key is None:
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+        return 1 if self._entries.pop(key, None) is not None else 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                          refresh: bool = False) -> Tuple[Any, Optional[float]]:
+        """
+        读取缓存，未命中时调用loader加载并写入
+        :param refresh: 忽略现有缓存强制重新加载
+        :return: (值, 缓存时长秒)，新加载的值缓存时长为None
+        """
+        if not refresh:
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight), None
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免"异常未被获取"的警告
+            future.exception()
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return value, None
+        finally:
+            self._inflight.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        return {"ttl": self.ttl, "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,181 @@
+import time
+import threading
+import logging
+from typing import Dict, Any, Optional, Tuple, List
+
+
+class StatusPublisher:
+    """
+    MQTT状态发布器
+    记录每个主题最后发布的值并丢弃重复值，窗口内的快速变化只发布最终值，
+    由后台线程按限速发布；publish可在任意线程调用
+    """
+
+    def __init__(self, client: Any = None, debounce: float = 0.2, max_rate: float = 50.0,
+                 qos: int = 1, retain: bool = True):
+        """
+        :param client: paho MQTT客户端，可稍后设置
+        :param debounce: 防抖窗口（秒），窗口内同一主题的多次变化只发布最后一次
+        :param max_rate: 每秒最多发布的消息数，<=0表示不限速
+        :param qos: 发布的QoS
+        :param retain: 是否保留消息
+        """
+        self.client = client
+        self.debounce = debounce
+        self.max_rate = max_rate
+        self.qos = qos
+        self.retain = retain
+        # 主题 -> 最后发布的值
+        self._last: Dict[str, Any] = {}
+        # 主题 -> (待发布的值, 发布时间点)
+        self._pending: Dict[str, Tuple[Any, float]] = {}
+        self._emitting = 0
+        # 已发布但尚未确认送达的消息（paho MQTTMessageInfo）
+        self._unacked: List[Any] = []
+        self._cond = threading.Condition()
+        self._tokens = max(max_rate, 1.0)
+        self._token_time = time.monotonic()
+        self._closed = False
+        self.stats: Dict[str, int] = {
+            "published": 0,
+            "suppressed_duplicate": 0,
+            "suppressed_debounce": 0,
+            "rate_limited": 0,
+            "errors": 0,
+        }
+        self.logger = logging.getLogger(__name__)
+        self._thread = threading.Thread(target=self._run, name="status-publisher", daemon=True)
+        self._thread.start()
+
+    def publish(self, topic: str, payload: Any, immediate: bool = False):
+        """
+        提交状态
+        :param topic: MQTT主题
+        :param payload: 状态值
+        :param immediate: 跳过防抖窗口，尽快发布
+        """
+        with self._cond:
+            if topic not in self._pending and self._last.get(topic) == payload:
+                self.stats["suppressed_duplicate"] += 1
+                return
+            now = time.monotonic()
+            pending = self._pending.get(topic)
+            if pending is not None:
+                # 窗口内的新值覆盖旧值，窗口不顺延，保证持续抖动时也会按窗口发布
+                self.stats["suppressed_debounce"] += 1
+                due = now if immediate else pending[1]
+            else:
+                due = now if immediate else now + self.debounce
+            self._pending[topic] = (payload, due)
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = 2.0, wait_delivery: bool = False) -> bool:
+        """
+        立即发布所有待发布的状态并等待完成
+        :param timeout: 最长等待时间（秒）
+        :param wait_delivery: 是否同时等待broker确认送达（QoS>0）
+        :return: 是否在超时前全部发布（以及确认送达）
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            for topic, (payload, _) in list(self._pending.items()):
+                self._pending[topic] = (payload, 0.0)
+            self._cond.notify_all()
+            while self._pending or self._emitting:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            unacked = list(self._unacked)
+        if not wait_delivery:
+            return True
+        for info in unacked:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            try:
+                info.wait_for_publish(remaining)
+            except Exception:
+                return False
+            if not info.is_published():
+                return False
+        return True
+
+    def forget(self, topic: str):
+        """清除主题的发布记录，下次发布不会被视为重复"""
+        with self._cond:
+            self._last.pop(topic, None)
+
+    def close(self, timeout: Optional[float] = 2.0):
+        """发布剩余状态后停止后台线程"""
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取发布和抑制统计"""
+        with self._cond:
+            return dict(self.stats, pending=len(self._pending), topics=len(self._last),
+                        debounce=self.debounce, max_rate=self.max_rate)
+
+    def _run(self):
+        """后台发布循环"""
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                due = [(topic, payload) for topic, (payload, at) in self._pending.items() if at <= now]
+                if not due:
+                    timeout = min(at for _, at in self._pending.values()) - now if self._pending else None
+                    self._cond.wait(timeout)
+                    continue
+                for topic, _ in due:
+                    self._pending.pop(topic, None)
+                self._emitting += len(due)
+                self._cond.release()
+                try:
+                    for topic, payload in due:
+                        self._emit(topic, payload)
+                finally:
+                    self._cond.acquire()
+                    self._emitting -= len(due)
+                    self._cond.notify_all()
+
+    def _acquire_token(self):
+        """令牌桶限速"""
+        if self.max_rate <= 0:
+            return
+        now = time.monotonic()
+        self._tokens = min(max(self.max_rate, 1.0), self._tokens + (now - self._token_time) * self.max_rate)
+        self._token_time = now
+        if self._tokens < 1.0:
+            self.stats["rate_limited"] += 1
+            time.sleep((1.0 - self._tokens) / self.max_rate)
+            self._tokens = 1.0
+            self._token_time = time.monotonic()
+        self._tokens -= 1.0
+
+    def _emit(self, topic: str, payload: Any):
+        """发布单条状态（不持有锁）"""
+        with self._cond:
+            if self._last.get(topic) == payload:
+                # 窗口内变化后又回到已发布的值
+                self.stats["suppressed_duplicate"] += 1
+                return
+        client = self.client
+        if client is None:
+            return
+        self._acquire_token()
+        try:
+            info = client.publish(topic, payload, qos=self.qos, retain=self.retain)
+        except Exception as e:
+            with self._cond:
+                self.stats["errors"] += 1
+            self.logger.error(f"发布状态 {topic} 失败: {e}")
+            return
+        with self._cond:
+            self._last[topic] = payload
+            self.stats["published"] += 1
+            if info is not None and hasattr(info, "is_published"):
+                self._unacked = [i for i in self._unacked if not i.is_published()]
+                self._unacked.append(info)
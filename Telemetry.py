@@ -0,0 +1,388 @@
+import time
+import json
+import zlib
+import asyncio
+import threading
+import logging
+from typing import Dict, Any, Callable, Optional, List, Tuple
+
+
+class RingBuffer:
+    """
+    单生产者/单消费者环形缓冲区
+    读写双方都不加锁，依赖GIL保证单次赋值的原子性；采样线程写入不会被发布线程阻塞
+    """
+
+    POLICIES = ("drop_oldest", "drop_newest")
+
+    def __init__(self, capacity: int, policy: str = "drop_oldest"):
+        """
+        :param capacity: 容量
+        :param policy: 缓冲区满时的策略，drop_oldest-覆盖最旧的样本，drop_newest-丢弃新样本
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"不支持的背压策略: {policy}")
+        self.capacity = max(1, int(capacity))
+        self.policy = policy
+        self._slots: List[Any] = [None] * self.capacity
+        # 累计写入数，只由生产者修改
+        self._head = 0
+        # 累计读取数，只由消费者修改
+        self._tail = 0
+        # 生产者丢弃的新样本数 / 消费者发现被覆盖的旧样本数
+        self.rejected = 0
+        self.overwritten = 0
+
+    def __len__(self) -> int:
+        return min(self._head - self._tail, self.capacity)
+
+    @property
+    def dropped(self) -> int:
+        """累计丢弃的样本数，包含尚未被消费者发现的覆盖"""
+        return self.rejected + self.overwritten + max(0, self._head - self._tail - self.capacity)
+
+    def push(self, item: Any) -> bool:
+        """写入一个样本（生产者线程调用）"""
+        head = self._head
+        if self.policy == "drop_newest" and head - self._tail >= self.capacity:
+            self.rejected += 1
+            return False
+        self._slots[head % self.capacity] = item
+        self._head = head + 1
+        return True
+
+    def drain(self) -> List[Any]:
+        """取出全部样本（消费者线程调用）"""
+        head = self._head
+        start = max(self._tail, head - self.capacity)
+        items = [self._slots[i % self.capacity] for i in range(start, head)]
+        # 读取期间生产者可能又覆盖了最前面的槽位，丢弃这部分可能不一致的样本
+        valid_from = max(start, self._head - self.capacity)
+        if valid_from > start:
+            items = items[valid_from - start:]
+        self.overwritten += valid_from - self._tail
+        self._tail = head
+        return items
+
+
+class EventRateMeter:
+    """
+    统计设备事件的触发频率（如相机帧率）
+    创建时包装设备的公开emit方法计数，不替换事件回调，遥操组重新注册回调不受影响；
+    应在设备创建后由事件循环线程创建，采样线程只读取计数
+    """
+
+    def __init__(self, emitter: Any, event: str):
+        # 不保存emitter的引用，节点以设备为弱引用键保存计数器
+        self.event = event
+        self._count = 0
+        self._last_count = 0
+        self._last_time = time.monotonic()
+        emit = emitter.emit
+
+        def counted_emit(event_name: str, *args, **kwargs):
+            if event_name == event:
+                self._count += 1
+            return emit(event_name, *args, **kwargs)
+
+        emitter.emit = counted_emit
+
+    def __call__(self) -> Optional[float]:
+        """返回距上次调用以来的事件频率（Hz）"""
+        now = time.monotonic()
+        count, last_count = self._count, self._last_count
+        elapsed = now - self._last_time
+        self._last_count, self._last_time = count, now
+        if elapsed <= 0:
+            return None
+        return round((count - last_count) / elapsed, 2)
+
+
+def _snapshot(value: Any) -> Any:
+    """复制样本（numpy数组转为列表），SDK原地修改数据时不影响已缓冲的样本"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {key: _snapshot(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_snapshot(item) for item in value]
+    return value
+
+
+class TelemetryStream:
+    """单个遥测数据流：按采样频率调用采样函数，样本写入环形缓冲区"""
+
+    def __init__(self, name: str, kind: str, sampler: Callable[[], Any], sample_rate: float,
+                 publish_rate: float, capacity: int, policy: str):
+        self.name = name
+        self.kind = kind
+        self.sampler = sampler
+        self.sample_rate = sample_rate
+        self.publish_rate = publish_rate
+        self.interval = 1.0 / sample_rate
+        self.ring = RingBuffer(capacity, policy)
+        self.next_sample_at = 0.0
+        self._last_value: Any = None
+        self.samples = 0
+        self.errors = 0
+
+    def sample(self):
+        """采样一次，采样函数返回None或与上次相同的值时跳过"""
+        try:
+            value = self.sampler()
+            if value is None:
+                return
+            value = _snapshot(value)
+        except Exception:
+            self.errors += 1
+            return
+        if value == self._last_value:
+            return
+        self._last_value = value
+        self.samples += 1
+        self.ring.push((time.time(), value))
+
+    def downsample(self, items: List[Tuple[float, Any]]) -> List[Tuple[float, Any]]:
+        """按发布频率降采样，每个时间片只保留最后一个样本"""
+        if self.publish_rate <= 0 or self.publish_rate >= self.sample_rate:
+            return items
+        buckets: Dict[int, Tuple[float, Any]] = {}
+        for ts, value in items:
+            buckets[int(ts * self.publish_rate)] = (ts, value)
+        return list(buckets.values())
+
+
+def _json_default(value: Any) -> Any:
+    """numpy数组等对象转为可序列化的值"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def parse_rates(spec: str) -> Dict[str, Tuple[float, float]]:
+    """
+    解析频率配置，如 "joint=30:10,pose=30,status=1"
+    键可以是数据类型或完整的流名称（如 device/3/joint），值为 采样频率[:发布频率]
+    :return: 键 -> (采样频率, 发布频率)，未指定发布频率时与采样频率相同
+    """
+    rates: Dict[str, Tuple[float, float]] = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        key, value = item.split("=", 1)
+        sample, _, publish = value.partition(":")
+        sample_rate = float(sample)
+        rates[key.strip()] = (sample_rate, float(publish) if publish else sample_rate)
+    return rates
+
+
+class TelemetryPublisher:
+    """
+    高频遥测发布器
+    采样线程按各数据流的频率从设备/遥操组对象读取数据写入环形缓冲区，
+    发布线程定期取出样本，降采样后按实体合并为一条消息，超过阈值时zlib压缩后发布到MQTT；
+    MQTT发送积压时暂停发布，由缓冲区的背压策略决定丢弃哪些样本
+    """
+
+    DEFAULT_RATES: Dict[str, Tuple[float, float]] = {
+        "joint": (30.0, 30.0),
+        "pose": (30.0, 30.0),
+        "end_effector": (10.0, 10.0),
+        "fps": (1.0, 1.0),
+        "status": (1.0, 1.0),
+    }
+
+    def __init__(self, discover: Callable[[], Dict[str, Tuple[str, Callable[[], Any]]]],
+                 client: Any = None, rates: Optional[Dict[str, Tuple[float, float]]] = None,
+                 publish_interval: float = 0.1, buffer_seconds: float = 2.0, policy: str = "drop_oldest",
+                 compress_threshold: int = 512, max_inflight: int = 100, discover_interval: float = 1.0):
+        """
+        :param discover: 返回当前数据源的函数，流名称 -> (数据类型, 采样函数)，流名称形如 device/3/joint
+        :param client: paho MQTT客户端，可稍后设置
+        :param rates: 数据类型或流名称 -> (采样频率, 发布频率)，覆盖默认值
+        :param publish_interval: 发布周期（秒），每个周期每个实体最多发布一条消息
+        :param buffer_seconds: 每个流缓冲的时长（秒），决定环形缓冲区容量
+        :param policy: 背压策略，drop_oldest 或 drop_newest
+        :param compress_threshold: 消息超过该字节数时压缩，<=0表示不压缩
+        :param max_inflight: MQTT未发送完成的消息数上限，超过时本周期不发布
+        :param discover_interval: 重新发现数据源的间隔（秒）
+        """
+        self.discover = discover
+        self.client = client
+        self.topic_prefix: Optional[str] = None
+        self.rates = dict(self.DEFAULT_RATES)
+        self.rates.update(rates or {})
+        self.publish_interval = publish_interval
+        self.buffer_seconds = buffer_seconds
+        self.policy = policy
+        self.compress_threshold = compress_threshold
+        self.max_inflight = max_inflight
+        self.discover_interval = discover_interval
+        self._streams: Dict[str, TelemetryStream] = {}
+        self._inflight: List[Any] = []
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.stats: Dict[str, int] = {
+            "messages": 0,
+            "samples_published": 0,
+            "bytes_raw": 0,
+            "bytes_sent": 0,
+            "deferred": 0,
+            "errors": 0,
+        }
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def policy(self) -> str:
+        return self._policy
+
+    @policy.setter
+    def policy(self, policy: str):
+        # 只影响之后创建的数据流
+        if policy not in RingBuffer.POLICIES:
+            raise ValueError(f"不支持的背压策略: {policy}")
+        self._policy = policy
+
+    def start(self):
+        """启动采样线程和发布线程"""
+        if self._threads:
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._sample_loop, name="telemetry-sampler", daemon=True),
+            threading.Thread(target=self._publish_loop, name="telemetry-publisher", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        """停止采样和发布，线程退出后发布缓冲区中剩余的样本（需在MQTT断开前调用）"""
+        self._stop.set()
+        running = bool(self._threads)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if running:
+            try:
+                self.publish_once()
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.logger.error(f"发布遥测数据失败: {e}")
+
+    def _rate_for(self, name: str, kind: str) -> Tuple[float, float]:
+        return self.rates.get(name) or self.rates.get(kind) or (0.0, 0.0)
+
+    def _sync_streams(self):
+        """根据当前数据源增删数据流；已有的流保留缓冲区，只更新采样函数"""
+        try:
+            sources = self.discover()
+        except Exception as e:
+            self.logger.error(f"发现遥测数据源失败: {e}")
+            return
+        streams = dict(self._streams)
+        for name in list(streams):
+            if name not in sources:
+                del streams[name]
+        for name, (kind, sampler) in sources.items():
+            stream = streams.get(name)
+            if stream is not None:
+                stream.sampler = sampler
+                continue
+            sample_rate, publish_rate = self._rate_for(name, kind)
+            if sample_rate <= 0:
+                continue
+            capacity = int(sample_rate * self.buffer_seconds) + 1
+            streams[name] = TelemetryStream(name, kind, sampler, sample_rate, publish_rate, capacity, self.policy)
+        # 整体替换，发布线程遍历的始终是完整的快照
+        self._streams = streams
+
+    def _sample_loop(self):
+        """采样线程"""
+        next_discover = 0.0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_discover:
+                self._sync_streams()
+                next_discover = now + self.discover_interval
+            next_due = next_discover
+            for stream in self._streams.values():
+                if now >= stream.next_sample_at:
+                    stream.sample()
+                    next_at = stream.next_sample_at + stream.interval
+                    # 落后超过一个周期时跳过错过的采样点，不连续补采
+                    stream.next_sample_at = next_at if next_at > now else now + stream.interval
+                next_due = min(next_due, stream.next_sample_at)
+            self._stop.wait(max(0.0, next_due - time.monotonic()))
+
+    def _publish_loop(self):
+        """发布线程"""
+        while not self._stop.wait(self.publish_interval):
+            try:
+                self.publish_once()
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.logger.error(f"发布遥测数据失败: {e}")
+
+    def _backlogged(self) -> bool:
+        self._inflight = [info for info in self._inflight if not info.is_published()]
+        return len(self._inflight) >= self.max_inflight
+
+    def publish_once(self) -> int:
+        """
+        取出所有流的样本并发布
+        Payload（按实体合并，超过阈值时为zlib压缩后的字节，可根据首字节是否为"{"区分）:
+        {"ts": 1700000000.1, "streams": {"joint": {"t": [1700000000.02, ...], "v": [[...], ...], "dropped": 0}}}
+        :return: 发布的消息数
+        """
+        client = self.client
+        if client is None or not self.topic_prefix:
+            return 0
+        if self._backlogged():
+            # 样本留在缓冲区中，由背压策略处理溢出
+            self.stats["deferred"] += 1
+            return 0
+
+        batches: Dict[str, Dict[str, Any]] = {}
+        for name, stream in self._streams.items():
+            dropped_before = stream.ring.rejected + stream.ring.overwritten
+            items = stream.downsample(stream.ring.drain())
+            if not items:
+                continue
+            entity = name.rsplit("/", 1)[0]
+            batches.setdefault(entity, {})[stream.kind] = {
+                "t": [round(ts, 3) for ts, _ in items],
+                "v": [value for _, value in items],
+                "dropped": stream.ring.rejected + stream.ring.overwritten - dropped_before,
+            }
+            self.stats["samples_published"] += len(items)
+
+        published = 0
+        for entity, streams in batches.items():
+            payload = json.dumps({"ts": round(time.time(), 3), "streams": streams},
+                                 separators=(",", ":"), default=_json_default).encode()
+            self.stats["bytes_raw"] += len(payload)
+            if 0 < self.compress_threshold <= len(payload):
+                payload = zlib.compress(payload, 1)
+            info = client.publish(f"{self.topic_prefix}/{entity}", payload, qos=0, retain=False)
+            if info is not None and hasattr(info, "is_published"):
+                self._inflight.append(info)
+            self.stats["bytes_sent"] += len(payload)
+            self.stats["messages"] += 1
+            published += 1
+        return published
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取发布统计和各数据流状态"""
+        streams = {
+            name: {
+                "sample_rate": stream.sample_rate,
+                "publish_rate": stream.publish_rate,
+                "samples": stream.samples,
+                "buffered": len(stream.ring),
+                "dropped": stream.ring.dropped,
+                "errors": stream.errors,
+            }
+            for name, stream in self._streams.items()
+        }
+        return dict(self.stats, running=bool(self._threads), policy=self.policy,
+                    inflight=len(self._inflight), streams=streams)
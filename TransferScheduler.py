@@ -0,0 +1,238 @@
+import os
+import time
+import uuid
+import heapq
+import asyncio
+import logging
+from typing import Dict, Any, Optional, List, Set, Callable, Awaitable
+
+from ChunkedUploader import ChunkedUploader
+
+
+class TransferScheduler:
+    """
+    上传调度器
+    按优先级排队上传文件（优先级高的先上传，同优先级按提交顺序），带宽由上传器的限速器统一限制；
+    从队列空闲到再次空闲为一个批次，统计批次的整体进度和吞吐量并通过notify回调推送
+    """
+
+    def __init__(self, uploader: ChunkedUploader,
+                 notify: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+                 max_concurrent: int = 1, progress_interval: float = 1.0):
+        """
+        :param uploader: 分片上传器
+        :param notify: 异步通知回调，参数为 (事件名, 信息)，事件名为 upload_progress / upload_result / upload_finished
+        :param max_concurrent: 同时上传的文件数，每个文件内部的分片已并行上传
+        :param progress_interval: 进度通知的最小间隔（秒）
+        """
+        self.uploader = uploader
+        self.notify = notify
+        self.max_concurrent = max(1, max_concurrent)
+        self.progress_interval = progress_interval
+        # (-优先级, 序号, 文件路径)，条目的序号与items中不一致时已失效
+        self._heap: List[tuple] = []
+        self._seq = 0
+        # 文件路径 -> 排队中或上传中的条目
+        self.items: Dict[str, Dict[str, Any]] = {}
+        self._workers: List[asyncio.Task] = []
+        # 通知等后台任务，保持引用直到完成
+        self._background_tasks: Set[asyncio.Task] = set()
+        self.batch: Optional[Dict[str, Any]] = None
+        self._last_notified = 0.0
+        self.logger = logging.getLogger(__name__)
+
+    def submit(self, files: List[Dict[str, Any]], base_url: str) -> Dict[str, Any]:
+        """
+        提交上传（需在事件循环中调用）
+        :param files: [{"file_path": ..., "session": ..., "priority": 0, "file_md5": 已知的MD5，可选,
+                        "md5_stat": 计算MD5时文件的 (大小, mtime_ns)，可选}]，按列表顺序排队
+        :param base_url: view_hdf5服务地址
+        :return: {"batch_id": ..., "queued": [...], "already_queued": [...]}，没有需要上传的文件时batch_id为None
+        """
+        if self.batch is None:
+            self.batch = {
+                "batch_id": uuid.uuid4().hex,
+                "started_at": time.time(),
+                "files_total": 0,
+                "files_done": 0,
+                "files_failed": 0,
+                "files_cancelled": 0,
+                "bytes_total": 0,
+                "bytes_done": 0,
+                "bytes_sent": 0,
+                "failed": [],
+            }
+        queued, already_queued = [], []
+        for file in files:
+            path = file["file_path"]
+            priority = int(file.get("priority", 0))
+            item = self.items.get(path)
+            if item is not None:
+                # 排队中的文件提高优先级时重新排队
+                if item["status"] == "queued" and priority > item["priority"]:
+                    item["priority"] = priority
+                    self._push(item)
+                already_queued.append(item["session"])
+                continue
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            item = {
+                "file_path": path,
+                "session": file.get("session") or os.path.splitext(os.path.basename(path))[0],
+                "priority": priority,
+                "base_url": base_url,
+                "file_md5": file.get("file_md5"),
+                "md5_stat": file.get("md5_stat"),
+                "size": size,
+                "status": "queued",
+                "bytes_done": 0,
+            }
+            self.items[path] = item
+            self._push(item)
+            self.batch["files_total"] += 1
+            self.batch["bytes_total"] += size
+            queued.append(item["session"])
+        self._spawn_workers()
+        if not self._workers:
+            self.batch = None
+            return {"batch_id": None, "queued": [], "already_queued": []}
+        return {"batch_id": self.batch["batch_id"], "queued": queued, "already_queued": already_queued}
+
+    def cancel(self) -> int:
+        """
+        取消排队中的上传，正在上传的文件继续完成
+        :return: 取消的文件数
+        """
+        cancelled = [item for item in self.items.values() if item["status"] == "queued"]
+        for item in cancelled:
+            del self.items[item["file_path"]]
+            self.batch["files_cancelled"] += 1
+            self.batch["bytes_total"] -= item["size"]
+        self._heap.clear()
+        return len(cancelled)
+
+    def _push(self, item: Dict[str, Any]):
+        self._seq += 1
+        item["seq"] = self._seq
+        heapq.heappush(self._heap, (-item["priority"], self._seq, item["file_path"]))
+
+    def _pop(self) -> Optional[Dict[str, Any]]:
+        while self._heap:
+            _, seq, path = heapq.heappop(self._heap)
+            item = self.items.get(path)
+            if item is not None and item["status"] == "queued" and item["seq"] == seq:
+                return item
+        return None
+
+    def _spawn_workers(self):
+        """按需启动上传任务；已结束但尚未移除的任务不计入"""
+        running = sum(1 for task in self._workers if not task.done())
+        while running < self.max_concurrent and self._heap:
+            task = asyncio.ensure_future(self._worker())
+            self._workers.append(task)
+            task.add_done_callback(self._worker_done)
+            running += 1
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = self._pop()
+            if item is None:
+                return
+            item["status"] = "running"
+
+            def on_progress(nbytes: int, resumed: bool, item=item):
+                loop.call_soon_threadsafe(self._on_progress, item, nbytes, resumed)
+
+            try:
+                result = await asyncio.to_thread(self.uploader.upload, item["file_path"], item["base_url"],
+                                                 on_progress, item["file_md5"], item["md5_stat"])
+            except Exception as e:
+                result = {"success": False, "message": str(e)}
+            self._on_result(item, result)
+
+    def _worker_done(self, task: asyncio.Task):
+        self._workers.remove(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error(f"上传调度异常: {task.exception()}")
+        # 任务退出后、移除前提交的文件还在队列中，继续上传而不结束批次
+        if self._heap:
+            self._spawn_workers()
+        if not self._workers and self.batch is not None:
+            summary = self._summary()
+            self.batch = None
+            self._emit("upload_finished", summary)
+
+    def _on_progress(self, item: Dict[str, Any], nbytes: int, resumed: bool):
+        if self.batch is None:
+            return
+        item["bytes_done"] += nbytes
+        self.batch["bytes_done"] += nbytes
+        if not resumed:
+            self.batch["bytes_sent"] += nbytes
+        now = time.monotonic()
+        if now - self._last_notified >= self.progress_interval:
+            self._last_notified = now
+            self._emit("upload_progress", self._summary())
+
+    def _on_result(self, item: Dict[str, Any], result: Dict[str, Any]):
+        self.items.pop(item["file_path"], None)
+        if result.get("success"):
+            item["status"] = "succeeded"
+            self.batch["files_done"] += 1
+        else:
+            item["status"] = "failed"
+            self.batch["files_failed"] += 1
+            self.batch["bytes_total"] -= item["size"]
+            self.batch["bytes_done"] -= item["bytes_done"]
+            self.batch["failed"].append({"session": item["session"], "message": result.get("message")})
+        self._emit("upload_result", dict(result, session=item["session"], batch_id=self.batch["batch_id"]))
+
+    def _summary(self) -> Dict[str, Any]:
+        """批次的整体进度和吞吐量"""
+        batch = self.batch
+        elapsed = time.time() - batch["started_at"]
+        rate = batch["bytes_sent"] / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, batch["bytes_total"] - batch["bytes_done"])
+        return {
+            "batch_id": batch["batch_id"],
+            "files_total": batch["files_total"],
+            "files_done": batch["files_done"],
+            "files_failed": batch["files_failed"],
+            "files_cancelled": batch["files_cancelled"],
+            "files_queued": sum(1 for item in self.items.values() if item["status"] == "queued"),
+            "uploading": [item["session"] for item in self.items.values() if item["status"] == "running"],
+            "bytes_total": batch["bytes_total"],
+            "bytes_done": batch["bytes_done"],
+            "progress": round(batch["bytes_done"] / batch["bytes_total"], 4) if batch["bytes_total"] else 1.0,
+            "mb_per_s": round(rate / (1024 * 1024), 3),
+            "eta_s": round(remaining / rate, 1) if rate > 0 else None,
+            "elapsed_s": round(elapsed, 1),
+            "failed": list(batch["failed"]),
+        }
+
+    def get_status(self) -> Dict[str, Any]:
+        """当前批次状态，空闲时batch为None"""
+        limiter = self.uploader.limiter
+        return {
+            "batch": self._summary() if self.batch is not None else None,
+            "bandwidth_limit_mb_per_s": round(limiter.rate / (1024 * 1024), 3) if limiter and limiter.rate else None,
+            "queue": [
+                {"session": item["session"], "priority": item["priority"], "size": item["size"], "status": item["status"]}
+                for item in sorted(self.items.values(), key=lambda i: (i["status"] != "running", -i["priority"], i["seq"]))
+            ],
+        }
+
+    def _spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        """创建后台任务并保持引用"""
+        task = asyncio.ensure_future(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    def _emit(self, event: str, payload: Dict[str, Any]):
+        if self.notify is None:
+            return
+        self._spawn(self.notify(event, payload))
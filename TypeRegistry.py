@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import importlib
+import importlib.util
+import threading
+import subprocess
+from typing import Dict, Any, Optional, List, Type
+
+_easyteleop_lock = threading.Lock()
+_easyteleop_ready = False
+
+
+def import_easyteleop(module_name: str):
+    """
+    导入EasyTeleop模块
+    EasyTeleop.Components在导入时加载matplotlib（可视化组件默认使用GUI后端），首次导入前强制使用非GUI后端
+    """
+    global _easyteleop_ready
+    with _easyteleop_lock:
+        if not _easyteleop_ready:
+            import matplotlib
+
+            matplotlib.use("Agg")
+            matplotlib.rcParams["backend"] = "Agg"
+            matplotlib.use = lambda *args, **kwargs: None
+            _easyteleop_ready = True
+    return importlib.import_module(module_name)
+
+
+def _package_dir(subpackage: str) -> Optional[str]:
+    """不导入EasyTeleop，查找其子包目录"""
+    try:
+        spec = importlib.util.find_spec("EasyTeleop")
+    except (ImportError, ValueError):
+        return None
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    for location in spec.submodule_search_locations:
+        path = os.path.join(location, subpackage)
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+def _module_names(directory: str) -> List[str]:
+    return sorted(filename[:-3] for filename in os.listdir(directory)
+                  if filename.endswith(".py") and filename != "__init__.py")
+
+
+class TypeRegistry:
+    """
+    设备和遥操组类型注册表
+    启动时不导入EasyTeleop：类型名通过扫描包目录得到（设备模块名与类名一致），
+    设备类和遥操组类在首次实例化时才导入；类型配置信息在首次请求时计算，并缓存到文件，
+    EasyTeleop的模块文件未变化时直接读取缓存
+    """
+
+    def __init__(self, cache_file: Optional[str] = None):
+        """
+        :param cache_file: 类型信息缓存文件路径，为None时不缓存
+        """
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        # 计算类型信息需要导入全部模块，单独加锁，不阻塞设备类的获取
+        self._types_lock = threading.Lock()
+        self._device_names: Optional[Dict[str, List[str]]] = None
+        self._device_classes: Dict[tuple, Optional[Type]] = {}
+        self._teleop_group_classes: Optional[Dict[str, Type]] = None
+        self._types: Dict[str, Any] = {}
+        self._fingerprint: Optional[str] = None
+        self.logger = logging.getLogger(__name__)
+
+    def device_names(self) -> Dict[str, List[str]]:
+        """
+        扫描设备目录，获取 {category: [type, ...]}，不导入设备模块
+        与EasyTeleop.Device.get_device_classes相同，排除Base开头的类
+        """
+        if self._device_names is None:
+            names: Dict[str, List[str]] = {}
+            device_dir = _package_dir("Device")
+            if device_dir is not None:
+                for category in sorted(os.listdir(device_dir)):
+                    category_path = os.path.join(device_dir, category)
+                    if os.path.isdir(category_path) and not category.startswith("__"):
+                        names[category] = [name for name in _module_names(category_path) if not name.startswith("Base")]
+            self._device_names = names
+        return self._device_names
+
+    def get_device_class(self, category: str, type_name: str) -> Optional[Type]:
+        """获取设备类，首次调用时导入对应模块；类型不存在或导入失败时返回None"""
+        key = (category, type_name)
+        with self._lock:
+            if key in self._device_classes:
+                return self._device_classes[key]
+        if type_name not in self.device_names().get(category, []):
+            return None
+        device_class = None
+        try:
+            module = import_easyteleop(f"EasyTeleop.Device.{category}.{type_name}")
+            base_device = import_easyteleop("EasyTeleop.Device").BaseDevice
+            candidate = getattr(module, type_name, None)
+            if isinstance(candidate, type) and issubclass(candidate, base_device):
+                device_class = candidate
+        except Exception as e:
+            print(f"导入模块 EasyTeleop.Device.{category}.{type_name} 时出错: {e}")
+        with self._lock:
+            self._device_classes[key] = device_class
+        return device_class
+
+    def get_teleop_group_class(self, type_name: str) -> Optional[Type]:
+        """
+        获取遥操组类，首次调用时导入
+        EasyTeleop.TeleopGroup包在导入时会加载全部遥操组，因此一次取得所有遥操组类
+        """
+        if self._teleop_group_classes is None:
+            classes = import_easyteleop("EasyTeleop.TeleopGroup").get_teleop_group_classes()
+            with self._lock:
+                if self._teleop_group_classes is None:
+                    self._teleop_group_classes = classes
+        return self._teleop_group_classes.get(type_name)
+
+    def _get_fingerprint(self) -> str:
+        """EasyTeleop设备和遥操组模块文件的指纹，文件变化后缓存失效"""
+        if self._fingerprint is None:
+            fingerprint = hashlib.sha1()
+            for subpackage in ("Device", "TeleopGroup"):
+                directory = _package_dir(subpackage)
+                if directory is None:
+                    continue
+                for root, dirs, files in os.walk(directory):
+                    dirs[:] = sorted(d for d in dirs if not d.startswith("__"))
+                    for name in sorted(files):
+                        if not name.endswith(".py"):
+                            continue
+                        stat = os.stat(os.path.join(root, name))
+                        rel_path = os.path.relpath(os.path.join(root, name), directory)
+                        fingerprint.update(f"{subpackage}/{rel_path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+            self._fingerprint = fingerprint.hexdigest()
+        return self._fingerprint
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            self.logger.error(f"读取类型缓存失败: {e}")
+            return
+        if cache.get("fingerprint") == self._get_fingerprint():
+            self._types.update(cache.get("types", {}))
+
+    def _save_cache(self):
+        """原子写入类型缓存文件"""
+        directory = os.path.dirname(self.cache_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.cache_file}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": self._get_fingerprint(), "types": self._types}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_file)
+        except (OSError, TypeError, ValueError) as e:
+            self.logger.error(f"保存类型缓存失败: {e}")
+
+    def _get_types(self, kind: str) -> Dict[str, Any]:
+        with self._types_lock:
+            if kind not in self._types and self.cache_file:
+                self._load_cache()
+            if kind not in self._types:
+                if kind == "device":
+                    self._types[kind] = import_easyteleop("EasyTeleop.Device").get_device_types()
+                else:
+                    self._types[kind] = import_easyteleop("EasyTeleop.TeleopGroup").get_teleop_group_types()
+                if self.cache_file:
+                    self._save_cache()
+            return self._types[kind]
+
+    def get_device_types(self) -> Dict[str, Dict[str, Any]]:
+        """设备类型配置，格式与EasyTeleop.Device.get_device_types一致"""
+        return self._get_types("device")
+
+    def get_teleop_group_types(self) -> Dict[str, Any]:
+        """遥操组类型配置，格式与EasyTeleop.TeleopGroup.get_teleop_group_types一致"""
+        return self._get_types("teleop_group")
+
+
+_BENCHMARKS = {
+    # 改为延迟导入前，节点启动时执行的EasyTeleop导入和类型计算
+    "eager": (
+        "import TypeRegistry\n"
+        "TypeRegistry.import_easyteleop('EasyTeleop.Components.PostProcess')\n"
+        "from EasyTeleop.Device import get_device_types, get_device_classes\n"
+        "from EasyTeleop.Device.Camera.RealSenseCamera import RealSenseCamera\n"
+        "from EasyTeleop.TeleopGroup import get_teleop_group_types, get_teleop_group_classes\n"
+        "get_device_types(); get_device_classes(); get_teleop_group_types(); get_teleop_group_classes()\n"
+    ),
+    "node_startup": "import node\nnode.Node('http://localhost:8000', 'ws://localhost:8000/ws/rpc', 'localhost', 1)\n",
+    "types_cold": "import TypeRegistry\nTypeRegistry.TypeRegistry().get_device_types()\n",
+    "types_cached": "import TypeRegistry\nTypeRegistry.TypeRegistry({cache!r}).get_device_types()\n",
+}
+
+
+def _benchmark(repeat: int, cache_file: str) -> Dict[str, float]:
+    """在独立的解释器中执行各场景，返回耗时中位数（秒）"""
+    TypeRegistry(cache_file).get_device_types()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for name, code in _BENCHMARKS.items():
+        timed = (
+            "import time\n_started = time.perf_counter()\n"
+            + code.format(cache=cache_file)
+            + "print(time.perf_counter() - _started)\n"
+        )
+        durations = []
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, "-c", timed], cwd=directory, check=True,
+                                    capture_output=True, text=True).stdout
+            durations.append(float(output.strip().splitlines()[-1]))
+        results[name] = sorted(durations)[len(durations) // 2]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="设备和遥操组类型注册表")
+    parser.add_argument("--build-cache", metavar="PATH", help="预先计算类型信息并写入缓存文件")
+    parser.add_argument("--benchmark", action="store_true", help="比较启动时导入EasyTeleop与延迟导入的耗时")
+    parser.add_argument("--repeat", type=int, default=5, help="每个场景的执行次数")
+    args = parser.parse_args()
+
+    if args.build_cache:
+        registry = TypeRegistry(args.build_cache)
+        started = time.perf_counter()
+        registry.get_device_types()
+        registry.get_teleop_group_types()
+        print(f"类型缓存已写入 {args.build_cache}，耗时 {(time.perf_counter() - started) * 1000.0:.1f} ms")
+    if args.benchmark:
+        cache_file = args.build_cache or os.path.join("datasets", "type_cache.json")
+        for name, duration in _benchmark(max(1, args.repeat), cache_file).items():
+            print(f"{name:<14} {duration * 1000.0:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,205 @@
 import json
+import time
+import random
+import reprlib
+import functools
 import asyncio
 import websockets
 import logging
+from collections import deque
 from uuid import uuid4
-from typing import Dict, Callable, Awaitable, Any, Optional
+from typing import Dict, Callable, Awaitable, Any, Optional, Set, List, Tuple
 from websockets.server import WebSocketServerProtocol
 
+# 可选的高性能序列化库，未安装时回退到标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# msgpack扩展类型编号：NumPy数组
+_EXT_NDARRAY = 1
+
+# 未指定参数的标记
+_UNSET = object()
+
+# 自定义错误码
+DEADLINE_EXCEEDED = -32001
+REQUEST_CANCELLED = -32800
+
+
+class RPCParseError(ValueError):
+    """收到的消息无法解析"""
+
+
+class RPCError(Exception):
+    """对端返回的RPC错误响应"""
+
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(f"RPC Error {code}: {message}")
+        self.code = code
+        self.data = data
+
+
+class LatencyStats:
+    """滚动窗口内的延迟统计（秒），提供p50/p95/p99"""
+
+    def __init__(self, window: int = 1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        """返回统计快照，时间单位为毫秒"""
+        if not self.samples:
+            return {"count": self.count, "window": 0}
+        ordered = sorted(self.samples)
+        n = len(ordered)
+
+        def percentile(q: float) -> float:
+            return ordered[min(n - 1, int(q * n))] * 1000.0
+
+        return {
+            "count": self.count,
+            "window": n,
+            "mean_ms": sum(ordered) / n * 1000.0,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": ordered[-1] * 1000.0,
+        }
+
+
+class _RequestAborted(Exception):
+    """请求因截止时间已过或被对端取消而中止"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def _is_ndarray(obj: Any) -> bool:
+    """判断对象是否为NumPy数组（不主动导入numpy）"""
+    return type(obj).__module__ == "numpy" and hasattr(obj, "dtype") and hasattr(obj, "shape")
+
+
+def _json_default(obj: Any) -> Any:
+    """标准库json无法处理的类型（NumPy数组/标量）"""
+    if _is_ndarray(obj):
+        return obj.tolist()
+    if type(obj).__module__ == "numpy" and hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class JsonSerializer:
+    """JSON编解码器，使用文本帧；安装orjson时自动使用orjson"""
+    name = "json"
+    binary = False
+
+    def dumps(self, obj: Any) -> str:
+        if orjson is not None:
+            try:
+                return orjson.dumps(
+                    obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+                ).decode("utf-8")
+            except TypeError:
+                pass
+        return json.dumps(obj, default=_json_default)
+
+    def loads(self, data: Any) -> Any:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+
+class MsgpackSerializer:
+    """msgpack编解码器，使用二进制帧；NumPy数组按原始内存编码为扩展类型"""
+    name = "msgpack"
+    binary = True
+
+    def _default(self, obj: Any) -> Any:
+        if _is_ndarray(obj):
+            if obj.ndim == 0:
+                return obj.item()
+            if not obj.flags.c_contiguous:
+                import numpy as np
+                obj = np.ascontiguousarray(obj)
+            header = msgpack.packb([obj.dtype.str, list(obj.shape)])
+            return msgpack.ExtType(_EXT_NDARRAY, header + obj.data.tobytes())
+        if type(obj).__module__ == "numpy" and hasattr(obj, "item"):
+            return obj.item()
+        raise TypeError(f"Object of type {type(obj).__name__} is not msgpack serializable")
+
+    def _ext_hook(self, code: int, data: bytes) -> Any:
+        if code == _EXT_NDARRAY:
+            import numpy as np
+            unpacker = msgpack.Unpacker(raw=False)
+            unpacker.feed(data)
+            dtype, shape = unpacker.unpack()
+            offset = unpacker.tell()
+            return np.frombuffer(data, dtype=np.dtype(dtype), offset=offset).reshape(shape)
+        return msgpack.ExtType(code, data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, default=self._default, use_bin_type=True)
+
+    def loads(self, data: Any) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False, ext_hook=self._ext_hook)
+
+
+class _TraceRepr(reprlib.Repr):
+    """
+    跟踪日志使用的有界repr
+    嵌套层数、每个容器的元素数和单个字符串/字节串的长度均有上限，格式化开销与消息大小无关
+    """
+
+    def __init__(self, max_length: int):
+        super().__init__()
+        self.maxlevel = 4
+        self.maxdict = self.maxlist = self.maxtuple = self.maxset = self.maxfrozenset = self.maxdeque = 16
+        self.maxstring = self.maxother = self.maxlong = max(max_length, 32)
+
+    def repr_bytes(self, x: bytes, level: int) -> str:
+        head = bytes(x[:self.maxstring])
+        if len(x) <= self.maxstring:
+            return repr(head)
+        return f"{head!r}...<{len(x)} bytes>"
+
+    def repr_bytearray(self, x: bytearray, level: int) -> str:
+        return f"bytearray({self.repr_bytes(x, level)})"
+
+
+@functools.lru_cache(maxsize=8)
+def _trace_repr(max_length: int) -> _TraceRepr:
+    return _TraceRepr(max_length)
+
+
+def _format_payload(payload: Any, max_length: int) -> str:
+    """格式化跟踪日志中的消息内容，并截断过长内容；max_length<=0时不截断，输出完整内容"""
+    if max_length <= 0:
+        return repr(payload)
+    text = _trace_repr(max_length).repr(payload)
+    if len(text) > max_length:
+        return f"{text[:max_length]}...<truncated>"
+    return text
+
+
+def available_serializers() -> Dict[str, Any]:
+    """当前环境可用的编解码器"""
+    serializers = {"json": JsonSerializer()}
+    if msgpack is not None:
+        serializers["msgpack"] = MsgpackSerializer()
+    return serializers
+
 
 class WebSocketRPC:
     """
@@ -13,7 +207,19 @@ class WebSocketRPC:
     支持双方同时作为客户端和服务器发起RPC调用
     """
 
-    def __init__(self):
+    def __init__(self, concurrent: bool = False, max_concurrency: int = 16,
+                 coalesce_window: float = 0.0, coalesce_max_batch: int = 32,
+                 codecs: Optional[List[str]] = None, default_timeout: Optional[float] = 30.0,
+                 heartbeat_interval: float = 0.0):
+        """
+        :param concurrent: 是否将每个收到的请求作为独立任务并发执行
+        :param max_concurrency: 并发模式下同时执行的请求上限，<=0表示不限制
+        :param coalesce_window: 发送合并窗口（秒），窗口内的调用/通知合并为一个batch帧发送，0表示关闭
+        :param coalesce_max_batch: 单个合并帧最多包含的消息数，达到后立即发送
+        :param codecs: 按优先级排列的可协商编解码器，默认优先msgpack，连接建立时始终使用json
+        :param default_timeout: 调用的默认超时时间（秒），None表示不超时
+        :param heartbeat_interval: 心跳间隔（秒），用于测量往返时延和检测失效连接，0表示关闭
+        """
         # 注册的方法映射
         self.methods: Dict[str, Callable[..., Awaitable[Any]]] = {}
         # 等待响应的回调函数，key为请求ID
@@ -24,13 +230,142 @@ class WebSocketRPC:
         self.request_id_counter = 0
         # 日志记录器
         self.logger = logging.getLogger(__name__)
+        # RPC消息跟踪：级别、单条内容最大长度、采样率
+        self.trace_level = logging.INFO
+        self.trace_max_length = 512
+        self.trace_sample_rate = 1.0
+        # 并发分发配置
+        self.concurrent = concurrent
+        self.max_concurrency = max_concurrency
+        self._dispatch_semaphore: Optional[asyncio.Semaphore] = (
+            asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        )
+        # 方法名 -> 串行组名，同组方法按到达顺序逐个执行
+        self.serial_groups: Dict[str, str] = {}
+        self._serial_locks: Dict[str, asyncio.Lock] = {}
+        # 正在执行的请求任务（保持引用，避免被垃圾回收）
+        self._dispatch_tasks: Set[asyncio.Task] = set()
+        # 发送合并配置与缓冲区：(消息, 发送完成Future, 入队时间)
+        self.coalesce_window = coalesce_window
+        self.coalesce_max_batch = max(1, coalesce_max_batch)
+        self._outbox: List[Tuple[dict, asyncio.Future, float]] = []
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._flush_lock = asyncio.Lock()
+        # 编解码器：每个连接默认使用json，协商成功后切换发送编码
+        self.serializers = available_serializers()
+        self.codecs = [c for c in (codecs or ["msgpack", "json"]) if c in self.serializers]
+        if "json" not in self.codecs:
+            self.codecs.append("json")
+        self.serializer = self.serializers["json"]
+        self.methods["rpc.negotiate_codec"] = self._negotiate_codec
+        # 超时配置：单次调用 > 按方法 > 默认
+        self.default_timeout = default_timeout
+        self.method_timeouts: Dict[str, Optional[float]] = {}
+        # 对端请求执行状态：请求ID -> 执行任务（排队中为None），以及已被取消的请求ID
+        self._active_requests: Dict[Any, Optional[asyncio.Task]] = {}
+        self._cancelled_requests: Set[Any] = set()
+        # 控制类方法在读循环中直接执行，不受并发上限影响
+        self._inline_methods: Set[str] = {"rpc.cancel", "rpc.ping"}
+        # 开始执行后不可中断的方法：截止时间和取消只在排队期间生效
+        self._uncancellable_methods: Set[str] = set()
+        self.methods["rpc.cancel"] = self._cancel_request
+        self.methods["rpc.ping"] = self._pong
+        # 心跳与延迟统计：按对端的往返时延，按方法的处理耗时和排队时间
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_max_failures = 3
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self.rtt_stats: Dict[str, LatencyStats] = {}
+        self.method_stats: Dict[str, Dict[str, Any]] = {}
+        # 断线重连：按方法配置在途调用的处理策略（replay-重连后重发，fail-立即失败）
+        self.replay_on_reconnect = False
+        self.reconnect_policies: Dict[str, str] = {}
+        self._inflight_requests: Dict[Any, dict] = {}
+        self._replay_ids: Set[Any] = set()
+        # 在途调用的本地截止时间（time.monotonic），重发时据此更新请求中的剩余超时
+        self._call_deadlines: Dict[Any, float] = {}
+        # 发送统计，用于调整合并窗口
+        self._send_stats_started = time.monotonic()
+        self.send_stats: Dict[str, float] = {
+            "frames_sent": 0,
+            "messages_sent": 0,
+            "bytes_sent": 0,
+            "coalesced_frames": 0,
+            "coalesced_messages": 0,
+            "queue_wait_total": 0.0,
+            "queue_wait_max": 0.0,
+        }
 
-    def register_method(self, name: str, method: Callable[..., Awaitable[Any]] = None):
+    def configure_tracing(self, level: Optional[int] = None, max_length: Optional[int] = None,
+                          sample_rate: Optional[float] = None):
+        """
+        配置RPC消息跟踪日志
+        :param level: 跟踪日志级别
+        :param max_length: 单条消息内容最大长度，<=0表示不截断
+        :param sample_rate: 采样率(0~1]，仅记录该比例的消息
+        """
+        if level is not None:
+            self.trace_level = level
+        if max_length is not None:
+            self.trace_max_length = max_length
+        if sample_rate is not None:
+            self.trace_sample_rate = min(max(sample_rate, 0.0), 1.0)
+
+    def set_method_timeout(self, method: str, timeout: Optional[float]):
+        """
+        设置调用某个远程方法的超时时间
+        :param method: 方法名称
+        :param timeout: 超时时间（秒），None表示不超时
+        """
+        self.method_timeouts[method] = timeout
+
+    def set_reconnect_policy(self, method: str, policy: str):
+        """
+        设置连接断开时该方法在途调用的处理策略
+        :param method: 方法名称
+        :param policy: replay-重连后重发（仅用于幂等方法），fail-立即失败（默认）
+        """
+        if policy not in ("replay", "fail"):
+            raise ValueError(f"Unknown reconnect policy: {policy}")
+        self.reconnect_policies[method] = policy
+
+    def _resolve_timeout(self, method: str, timeout: Any) -> Optional[float]:
+        """按 单次调用 > 按方法 > 默认 的优先级确定超时时间"""
+        if timeout is not _UNSET:
+            return timeout
+        return self.method_timeouts.get(method, self.default_timeout)
+
+    def _trace(self, event: str, message: Any):
+        """
+        记录RPC消息跟踪日志
+        未启用对应级别或未被采样时直接返回；
+        日志可能在后台线程中才输出，消息内容在此立即格式化，之后对消息的修改不影响日志
+        """
+        if not self.logger.isEnabledFor(self.trace_level):
+            return
+        if self.trace_sample_rate < 1.0 and random.random() >= self.trace_sample_rate:
+            return
+        if isinstance(message, dict):
+            extra = {"rpc_event": event, "rpc_method": message.get("method"), "rpc_id": message.get("id")}
+        else:
+            extra = {"rpc_event": event, "rpc_method": None, "rpc_id": None}
+        self.logger.log(self.trace_level, "%s: %s", event, _format_payload(message, self.trace_max_length), extra=extra)
+
+    def register_method(self, name: str, method: Callable[..., Awaitable[Any]] = None, serial_group: Optional[str] = None,
+                        cancellable: bool = True):
         """
         注册可被远程调用的方法
         :param name: 方法名称
         :param method: 实际执行函数
+        :param serial_group: 串行组名称，并发模式下同组方法按到达顺序串行执行
+        :param cancellable: 为False时开始执行后不再因对端取消或截止时间而中断，
+                            用于中途取消会使状态不一致的方法（如启停设备后更新设备池）
         """
+        if serial_group is not None:
+            self.serial_groups[name] = serial_group
+        if cancellable:
+            self._uncancellable_methods.discard(name)
+        else:
+            self._uncancellable_methods.add(name)
         if method is not None:
             self.methods[name] = method
         else:
@@ -40,12 +375,14 @@ class WebSocketRPC:
                 return func
             return decorator
 
-    async def call(self, method: str, params: Any = None, is_notification: bool = False) -> Any:
+    async def call(self, method: str, params: Any = None, is_notification: bool = False,
+                   timeout: Any = _UNSET) -> Any:
         """
         调用远程方法
         :param method: 方法名称
         :param params: 方法参数
         :param is_notification: 是否为通知（不需要响应）
+        :param timeout: 本次调用的超时时间（秒），None表示不超时，未指定时使用按方法或默认配置
         :return: 远程方法返回结果
         """
         if not self.websocket or self.websocket.state.name == 'CLOSED':
@@ -60,31 +397,79 @@ class WebSocketRPC:
         if params is not None:
             request["params"] = params
 
-        # 记录发送的请求
-        self.logger.info(f"发送RPC请求: {request}")
-
         # 如果是通知，不设置ID，也不等待响应
-        if not is_notification:
-            self.request_id_counter += 1
-            request_id = self.request_id_counter
-            request["id"] = request_id
+        if is_notification:
+            self._trace("发送RPC请求", request)
+            await self._send_request(request)
+            return None
 
-            # 创建Future对象等待响应
-            future = asyncio.Future()
-            self.pending_responses[request_id] = future
+        self.request_id_counter += 1
+        request_id = self.request_id_counter
+        request["id"] = request_id
 
-        # 发送请求
-        await self.websocket.send(json.dumps(request))
+        # 携带剩余超时（秒），对端收到后换算为本地截止时间，据此放弃已无人等待的请求；
+        # 使用相对时间，不依赖两端时钟一致
+        call_timeout = self._resolve_timeout(method, timeout)
+        if call_timeout is not None:
+            request["timeout"] = call_timeout
+            self._call_deadlines[request_id] = time.monotonic() + call_timeout
 
-        # 如果是通知，直接返回
-        if is_notification:
-            return None
+        # 创建Future对象等待响应
+        future = asyncio.get_running_loop().create_future()
+        self.pending_responses[request_id] = future
+        self._inflight_requests[request_id] = request
+
+        # 记录发送的请求
+        self._trace("发送RPC请求", request)
 
-        # 等待响应
         try:
-            return await asyncio.wait_for(future, timeout=30.0)  # 30秒超时
+            # 发送请求（开启合并时进入缓冲区，等待合并帧发送完成）
+            await self._send_request(request)
+            # 等待响应
+            return await asyncio.wait_for(future, timeout=call_timeout)
         except asyncio.TimeoutError:
-            raise Exception(f"调用方法 {method} 超时")
+            self._send_cancel(request_id)
+            raise TimeoutError(f"调用方法 {method} 超时")
+        except asyncio.CancelledError:
+            # 调用方放弃等待，通知对端取消
+            self._send_cancel(request_id)
+            raise
+        finally:
+            self.pending_responses.pop(request_id, None)
+            self._inflight_requests.pop(request_id, None)
+            self._call_deadlines.pop(request_id, None)
+            self._replay_ids.discard(request_id)
+
+    async def _send_request(self, request: dict):
+        """发送调用/通知（开启合并时进入缓冲区，等待合并帧发送完成）"""
+        if self.coalesce_window > 0:
+            await self._enqueue_outgoing(request)
+        else:
+            await self._send_frame(request)
+
+    def _send_cancel(self, request_id: Any):
+        """通知对端取消请求（后台发送，失败忽略）"""
+        if not self.websocket or self.websocket.state.name == 'CLOSED':
+            return
+
+        async def send():
+            try:
+                await self.notify("rpc.cancel", {"id": request_id})
+            except Exception as e:
+                self.logger.debug(f"发送取消通知失败: {e}")
+
+        self._spawn(send())
+
+    async def _cancel_request(self, params: Any = None):
+        """处理对端发来的取消通知"""
+        request_id = params.get("id") if isinstance(params, dict) else None
+        if request_id not in self._active_requests:
+            return None
+        self._cancelled_requests.add(request_id)
+        task = self._active_requests.get(request_id)
+        if task is not None and not task.done():
+            task.cancel()
+        return None
 
     async def notify(self, method: str, params: Any = None):
         """
@@ -94,14 +479,137 @@ class WebSocketRPC:
         """
         await self.call(method, params, is_notification=True)
 
-    async def _handle_request(self, request: dict):
-        """处理收到的RPC请求"""
+    async def call_batch(self, calls: List[Tuple[str, Any]], timeout: Any = _UNSET) -> List[asyncio.Future]:
+        """
+        在一个消息帧中批量调用远程方法
+        :param calls: (方法名称, 方法参数) 列表
+        :param timeout: 超时时间（秒），None表示不超时，未指定时使用默认配置
+        :return: 与calls一一对应的Future列表，各自在收到对应响应或超时时完成
+        """
+        if not self.websocket or self.websocket.state.name == 'CLOSED':
+            raise Exception("WebSocket连接未建立或已关闭")
+
+        loop = asyncio.get_running_loop()
+        batch = []
+        futures = []
+        timers: List[Optional[asyncio.TimerHandle]] = []
+        for method, params in calls:
+            self.request_id_counter += 1
+            request_id = self.request_id_counter
+            request = {
+                "jsonrpc": "2.0",
+                "method": method,
+                "id": request_id,
+            }
+            if params is not None:
+                request["params"] = params
+            call_timeout = self._resolve_timeout(method, timeout)
+            timer = None
+            if call_timeout is not None:
+                request["timeout"] = call_timeout
+                self._call_deadlines[request_id] = time.monotonic() + call_timeout
+                timer = loop.call_later(call_timeout, self._expire_call, request_id, method)
+            future = loop.create_future()
+            # 无论收到响应、超时还是被调用方取消，都从等待表中移除
+            future.add_done_callback(lambda f, rid=request_id, t=timer: self._on_batch_call_done(f, rid, t))
+            self.pending_responses[request_id] = future
+            self._inflight_requests[request_id] = request
+            batch.append(request)
+            futures.append(future)
+            timers.append(timer)
+
+        if not batch:
+            return futures
+
+        # 记录发送的批量请求
+        self._trace("发送RPC批量请求", batch)
+
+        try:
+            await self._send_frame(batch, len(batch))
+        except Exception as e:
+            # 请求未发出：移除等待和重发记录，使Future失败，异常同时抛给调用方
+            for request, future, timer in zip(batch, futures, timers):
+                if timer is not None:
+                    timer.cancel()
+                self._discard_call(request["id"])
+                if not future.done():
+                    future.set_exception(e)
+                    # 调用方从本方法得到异常，标记为已读取，避免未读取异常的警告
+                    future.exception()
+            raise
+        return futures
+
+    def _on_batch_call_done(self, future: asyncio.Future, request_id: Any, timer: Optional[asyncio.TimerHandle]):
+        """批量调用中的单个调用完成：停止超时计时，从等待表中移除，被调用方取消时通知对端"""
+        if timer is not None:
+            timer.cancel()
+        self._discard_call(request_id)
+        if future.cancelled():
+            self._send_cancel(request_id)
+
+    def _discard_call(self, request_id: Any):
+        """从等待表中移除调用"""
+        self.pending_responses.pop(request_id, None)
+        self._inflight_requests.pop(request_id, None)
+        self._call_deadlines.pop(request_id, None)
+        self._replay_ids.discard(request_id)
+
+    async def replay_pending(self) -> int:
+        """
+        重连后重发断线时保留的在途调用
+        :return: 重发的调用数
+        """
+        replayed = 0
+        for request_id in list(self._replay_ids):
+            self._replay_ids.discard(request_id)
+            request = self._inflight_requests.get(request_id)
+            future = self.pending_responses.get(request_id)
+            if request is None or future is None or future.done():
+                continue
+            deadline = self._call_deadlines.get(request_id)
+            if deadline is not None:
+                # 断线期间已过去的时间不再计入对端的超时
+                request["timeout"] = max(0.0, deadline - time.monotonic())
+            try:
+                await self._send_request(request)
+                replayed += 1
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+        if replayed:
+            self.logger.info(f"重连后重发 {replayed} 个在途调用")
+        return replayed
+
+    def _fail_pending(self):
+        """连接关闭时处理在途调用：可重发的保留等待重连，其余立即失败"""
+        for request_id, future in list(self.pending_responses.items()):
+            if future.done():
+                continue
+            request = self._inflight_requests.get(request_id)
+            if (self.replay_on_reconnect and request is not None
+                    and self.reconnect_policies.get(request.get("method")) == "replay"):
+                self._replay_ids.add(request_id)
+                continue
+            future.set_exception(ConnectionAbortedError("WebSocket connection closed"))
+            self.pending_responses.pop(request_id, None)
+            self._inflight_requests.pop(request_id, None)
+            self._call_deadlines.pop(request_id, None)
+
+    def _expire_call(self, request_id: Any, method: str):
+        """批量调用中的单个调用超时"""
+        future = self.pending_responses.pop(request_id, None)
+        if future is not None and not future.done():
+            future.set_exception(TimeoutError(f"调用方法 {method} 超时"))
+            self._send_cancel(request_id)
+
+    async def _execute_request(self, request: dict) -> Optional[dict]:
+        """执行收到的RPC请求，返回需要发送的响应（通知返回None）"""
         request_id = request.get('id')
         method_name = request.get('method')
         params = request.get('params', [])
 
         # 记录收到的请求
-        self.logger.info(f"收到RPC请求: {request}")
+        self._trace("收到RPC请求", request)
 
         # 构建响应基础结构
         response = {
@@ -128,12 +636,28 @@ class WebSocketRPC:
             # else:
             #     result = await method(params)
 
-            result = await method(params)
+            started_at = time.monotonic()
+            try:
+                if request_id is None or method_name in self._inline_methods:
+                    result = await method(params)
+                else:
+                    result = await self._run_cancellable(request_id, request.get('_deadline'), method(params),
+                                                         method_name not in self._uncancellable_methods)
+            except Exception:
+                self._method_stats(method_name)["errors"] += 1
+                raise
+            finally:
+                self._method_stats(method_name)["latency"].record(time.monotonic() - started_at)
 
             # 成功响应
             if request_id is not None:
                 response['result'] = result
 
+        except _RequestAborted as e:
+            # 对端已放弃该请求，无需响应
+            if e.code == REQUEST_CANCELLED:
+                return None
+            response['error'] = {'code': e.code, 'message': str(e)}
         except Exception as e:
             # 错误响应
             if request_id is not None:
@@ -143,58 +667,445 @@ class WebSocketRPC:
                     'data': type(e).__name__
                 }
 
+        if request_id is None:
+            return None
+
         # 记录发送的响应
-        self.logger.info(f"发送RPC响应: {response}")
+        self._trace("发送RPC响应", response)
+        return response
+
+    async def negotiate_serializer(self) -> str:
+        """
+        与对端协商本连接使用的编解码器
+        对端不支持协商（旧版本后端）时保持json
+        :return: 协商后的编解码器名称
+        """
+        if self.codecs == ["json"]:
+            return self.serializer.name
+        try:
+            result = await self.call("rpc.negotiate_codec", {"codecs": self.codecs})
+        except Exception as e:
+            self.logger.info(f"编解码器协商失败，继续使用json: {e}")
+            return self.serializer.name
+        codec = result.get("codec") if isinstance(result, dict) else None
+        if codec in self.serializers:
+            self.serializer = self.serializers[codec]
+        self.logger.info(f"使用编解码器: {self.serializer.name}")
+        return self.serializer.name
+
+    async def _negotiate_codec(self, params: Any = None) -> Dict[str, str]:
+        """处理对端发起的编解码器协商，按本端优先级选择双方都支持的编解码器"""
+        offered = params.get("codecs", []) if isinstance(params, dict) else []
+        codec = next((c for c in self.codecs if c in offered), "json")
+        self.serializer = self.serializers[codec]
+        return {"codec": codec}
+
+    def _decode_message(self, message: Any) -> Any:
+        """根据帧类型解码消息：文本帧为json，二进制帧为msgpack"""
+        try:
+            if isinstance(message, (bytes, bytearray, memoryview)):
+                if "msgpack" not in self.serializers:
+                    raise RPCParseError("binary frames are not supported")
+                return self.serializers["msgpack"].loads(message)
+            return self.serializers["json"].loads(message)
+        except RPCParseError:
+            raise
+        except Exception as e:
+            raise RPCParseError(str(e)) from e
+
+    async def _run_cancellable(self, request_id: Any, deadline: Optional[float], coro: Awaitable[Any],
+                               cancellable: bool = True) -> Any:
+        """
+        以独立任务执行请求，支持对端取消并遵守请求的截止时间
+        :param deadline: 本地截止时间（time.monotonic），None表示不限时
+        :param cancellable: 为False时只在开始执行前检查取消和截止时间，开始后执行到结束；
+                            超过截止时间的结果以DEADLINE_EXCEEDED响应，串行组在执行结束前不释放
+        """
+        task = None
+        try:
+            # 排队期间已被取消或已超过截止时间，不再执行
+            if request_id in self._cancelled_requests:
+                coro.close()
+                raise _RequestAborted(REQUEST_CANCELLED, "Request cancelled")
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    coro.close()
+                    raise _RequestAborted(DEADLINE_EXCEEDED, "Deadline exceeded")
+
+            task = asyncio.ensure_future(coro)
+            if not cancellable:
+                # 不再登记为可取消，之后的取消通知被忽略
+                self._active_requests.pop(request_id, None)
+                return await self._run_to_completion(task, deadline)
+            self._active_requests[request_id] = task
+            return await asyncio.wait_for(asyncio.shield(task), timeout=remaining)
+        except asyncio.TimeoutError:
+            task.cancel()
+            raise _RequestAborted(DEADLINE_EXCEEDED, "Deadline exceeded")
+        except asyncio.CancelledError:
+            if request_id in self._cancelled_requests and task is not None and task.cancelled():
+                raise _RequestAborted(REQUEST_CANCELLED, "Request cancelled")
+            # 自身被取消（例如连接关闭），同时取消执行任务
+            if task is not None and cancellable:
+                task.cancel()
+            raise
+        finally:
+            self._active_requests.pop(request_id, None)
+            self._cancelled_requests.discard(request_id)
+
+    @staticmethod
+    async def _run_to_completion(task: asyncio.Task, deadline: Optional[float]) -> Any:
+        """等待不可中断的请求执行结束；自身被取消（如连接关闭）时也先等待其结束"""
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done():
+                await asyncio.wait([task])
+            raise
+        if deadline is not None and time.monotonic() > deadline:
+            raise _RequestAborted(DEADLINE_EXCEEDED, "Deadline exceeded")
+        return result
 
-        # 发送响应（仅当有ID且连接存在时）
-        if request_id is not None and self.websocket and self.websocket.state.name != 'CLOSED':
-            await self.websocket.send(json.dumps(response))
+    async def _send_frame(self, payload: Any, message_count: int = 1):
+        """序列化并发送一个消息帧，同时更新发送统计"""
+        data = self.serializer.dumps(payload)
+        await self.websocket.send(data)
+        self.send_stats["frames_sent"] += 1
+        self.send_stats["messages_sent"] += message_count
+        self.send_stats["bytes_sent"] += len(data)
+
+    async def _send_payload(self, payload: Any):
+        """发送响应（连接存在时）"""
+        if self.websocket and self.websocket.state.name != 'CLOSED':
+            await self._send_frame(payload, len(payload) if isinstance(payload, list) else 1)
+
+    def _enqueue_outgoing(self, message: dict) -> asyncio.Future:
+        """
+        将调用/通知放入发送缓冲区
+        :return: 消息所在帧发送完成时完成的Future
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._outbox.append((message, future, time.monotonic()))
+        if len(self._outbox) >= self.coalesce_max_batch:
+            self._spawn(self._flush_outbox())
+        elif self._flush_timer is None:
+            self._flush_timer = loop.call_later(self.coalesce_window, self._on_flush_timer)
+        return future
+
+    def _on_flush_timer(self):
+        """合并窗口到期"""
+        self._flush_timer = None
+        self._spawn(self._flush_outbox())
+
+    async def _flush_outbox(self):
+        """将缓冲区中的消息按最大批量拆分并发送"""
+        async with self._flush_lock:
+            while self._outbox:
+                entries = self._outbox[:self.coalesce_max_batch]
+                del self._outbox[:len(entries)]
+                messages = [message for message, _, _ in entries]
+                now = time.monotonic()
+                try:
+                    if not self.websocket or self.websocket.state.name == 'CLOSED':
+                        raise ConnectionAbortedError("WebSocket connection closed")
+                    # 只有一条消息时按单个对象发送，兼容不支持batch的对端
+                    if len(messages) == 1:
+                        await self._send_frame(messages[0])
+                    else:
+                        await self._send_frame(messages, len(messages))
+                        self.send_stats["coalesced_frames"] += 1
+                        self.send_stats["coalesced_messages"] += len(messages)
+                except Exception as e:
+                    for _, future, _ in entries:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+
+                for _, future, enqueued_at in entries:
+                    wait = now - enqueued_at
+                    self.send_stats["queue_wait_total"] += wait
+                    if wait > self.send_stats["queue_wait_max"]:
+                        self.send_stats["queue_wait_max"] = wait
+                    if not future.done():
+                        future.set_result(None)
+
+    def get_send_stats(self) -> Dict[str, float]:
+        """获取发送吞吐和合并延迟统计"""
+        stats = dict(self.send_stats)
+        elapsed = max(time.monotonic() - self._send_stats_started, 1e-9)
+        frames = stats["frames_sent"]
+        coalesced_messages = stats["coalesced_messages"]
+        stats["messages_per_second"] = stats["messages_sent"] / elapsed
+        stats["frames_per_second"] = frames / elapsed
+        stats["bytes_per_second"] = stats["bytes_sent"] / elapsed
+        stats["avg_messages_per_frame"] = stats["messages_sent"] / frames if frames else 0.0
+        stats["avg_coalesced_batch"] = (
+            coalesced_messages / stats["coalesced_frames"] if stats["coalesced_frames"] else 0.0
+        )
+        stats["pending_outgoing"] = len(self._outbox)
+        stats["coalesce_window"] = self.coalesce_window
+        return stats
+
+    def _abort_outbox(self):
+        """连接关闭时使缓冲区中的消息失败"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        for _, future, _ in self._outbox:
+            if not future.done():
+                future.set_exception(ConnectionAbortedError("WebSocket connection closed"))
+        self._outbox.clear()
+
+    async def _handle_request(self, request: dict):
+        """处理收到的RPC请求"""
+        response = await self._execute_request(request)
+        # 发送响应（仅当有ID时）
+        if response is not None:
+            await self._send_payload(response)
 
     def _handle_response(self, response: dict):
         """处理收到的RPC响应"""
         response_id = response.get('id')
         
         # 记录收到的响应
-        self.logger.info(f"收到RPC响应: {response}")
+        self._trace("收到RPC响应", response)
 
         if response_id in self.pending_responses:
             future = self.pending_responses.pop(response_id)
 
             # 处理错误响应
             if 'error' in response:
-                future.set_exception(Exception(
-                    f"RPC Error {response['error']['code']}: {response['error']['message']}"
-                ))
+                error = response['error']
+                future.set_exception(RPCError(error.get('code'), error.get('message'), error.get('data')))
             # 处理成功响应
             else:
                 future.set_result(response.get('result'))
 
+    def _method_stats(self, method_name: Any) -> Dict[str, Any]:
+        """获取方法的处理统计（未注册的方法归入同一项，避免统计表无限增长）"""
+        key = method_name if method_name in self.methods else "<unknown>"
+        stats = self.method_stats.get(key)
+        if stats is None:
+            stats = {"latency": LatencyStats(), "queue_wait": LatencyStats(), "errors": 0}
+            self.method_stats[key] = stats
+        return stats
+
+    def _peer_name(self) -> str:
+        """当前连接对端的名称"""
+        address = getattr(self.websocket, "remote_address", None)
+        if isinstance(address, tuple) and len(address) >= 2:
+            return f"{address[0]}:{address[1]}"
+        return str(address) if address else "peer"
+
+    async def _pong(self, params: Any = None) -> Dict[str, float]:
+        """响应对端心跳"""
+        return {"time": time.time()}
+
+    async def ping(self, timeout: Optional[float] = 5.0) -> float:
+        """
+        发送一次心跳并记录往返时延
+        对端不支持rpc.ping时返回的错误响应同样可以测量往返时延
+        :return: 往返时延（秒）
+        """
+        peer = self._peer_name()
+        started_at = time.monotonic()
+        try:
+            await self.call("rpc.ping", None, timeout=timeout)
+        except RPCError:
+            pass
+        rtt = time.monotonic() - started_at
+        stats = self.rtt_stats.get(peer)
+        if stats is None:
+            stats = LatencyStats()
+            self.rtt_stats[peer] = stats
+        stats.record(rtt)
+        return rtt
+
+    async def _heartbeat_loop(self, websocket: Any):
+        """定期心跳，连续失败达到上限时关闭连接以触发重连"""
+        failures = 0
+        while self.websocket is websocket:
+            await asyncio.sleep(self.heartbeat_interval)
+            if self.websocket is not websocket:
+                break
+            try:
+                await self.ping(timeout=self.heartbeat_interval)
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                self.logger.warning(f"心跳失败({failures}/{self.heartbeat_max_failures}): {e}")
+                if failures >= self.heartbeat_max_failures:
+                    self.logger.error("心跳连续失败，关闭连接")
+                    await websocket.close()
+                    break
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取链路时延、方法处理耗时、排队时间和发送统计"""
+        return {
+            "peer": self._peer_name() if self.websocket else None,
+            "rtt": {peer: stats.snapshot() for peer, stats in self.rtt_stats.items()},
+            "methods": {
+                name: {
+                    "latency": stats["latency"].snapshot(),
+                    "queue_wait": stats["queue_wait"].snapshot(),
+                    "errors": stats["errors"],
+                }
+                for name, stats in self.method_stats.items()
+            },
+            "send": self.get_send_stats(),
+            "pending_calls": len(self.pending_responses),
+            "active_requests": len(self._active_requests),
+        }
+
+    def serial_lock(self, group: str) -> asyncio.Lock:
+        """获取串行组对应的锁，本地代码需要与该组的方法互斥执行时也可持有"""
+        lock = self._serial_locks.get(group)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._serial_locks[group] = lock
+        return lock
+
+    async def _execute_with_policy(self, request: dict) -> Optional[dict]:
+        """按串行组和并发上限执行请求，返回需要发送的响应"""
+        queued_at = time.monotonic()
+        request_id = request.get('id')
+        tracked = request_id is not None and request_id not in self._active_requests
+        if tracked:
+            # 登记为排队中，使排队期间也能被对端取消
+            self._active_requests[request_id] = None
+        try:
+            group = self.serial_groups.get(request.get('method'))
+            # 先按串行组排队，再占用并发名额，避免排队中的请求占住名额
+            if group is not None:
+                async with self.serial_lock(group):
+                    return await self._execute_with_limit(request, queued_at)
+            return await self._execute_with_limit(request, queued_at)
+        finally:
+            if tracked:
+                self._active_requests.pop(request_id, None)
+                self._cancelled_requests.discard(request_id)
+
+    async def _execute_with_limit(self, request: dict, queued_at: float) -> Optional[dict]:
+        """在并发上限内执行请求"""
+        if self._dispatch_semaphore is None:
+            self._method_stats(request.get('method'))["queue_wait"].record(time.monotonic() - queued_at)
+            return await self._execute_request(request)
+        async with self._dispatch_semaphore:
+            self._method_stats(request.get('method'))["queue_wait"].record(time.monotonic() - queued_at)
+            return await self._execute_request(request)
+
+    async def _run_dispatched_request(self, request: dict):
+        """在并发模式下执行单个请求并发送响应"""
+        try:
+            response = await self._execute_with_policy(request)
+            if response is not None:
+                await self._send_payload(response)
+        except Exception as e:
+            self.logger.error(f"处理RPC请求 {request.get('method')} 出错: {e}")
+
+    def _spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        """创建后台任务并保持引用"""
+        task = asyncio.create_task(coro)
+        self._dispatch_tasks.add(task)
+        task.add_done_callback(self._dispatch_tasks.discard)
+        return task
+
+    def _dispatch_request(self, request: dict) -> asyncio.Task:
+        """将请求作为独立任务调度执行"""
+        return self._spawn(self._run_dispatched_request(request))
+
+    async def _handle_batch(self, batch: list):
+        """
+        处理批量消息（JSON-RPC 2.0 batch）
+        响应直接交付，请求并发执行并合并为一个数组响应帧
+        """
+        if not batch:
+            await self._send_payload({
+                'jsonrpc': '2.0',
+                'id': None,
+                'error': {'code': -32600, 'message': 'Invalid Request'}
+            })
+            return
+
+        requests = []
+        invalid_responses = []
+        for item in batch:
+            if isinstance(item, dict) and item.get('method') in self._inline_methods:
+                await self._handle_request(item)
+            elif isinstance(item, dict) and 'method' in item:
+                self._stamp_deadline(item)
+                requests.append(item)
+            elif isinstance(item, dict) and 'id' in item:
+                self._handle_response(item)
+            else:
+                invalid_responses.append({
+                    'jsonrpc': '2.0',
+                    'id': None,
+                    'error': {'code': -32600, 'message': 'Invalid Request'}
+                })
+
+        if not requests and not invalid_responses:
+            return
+
+        if self.concurrent:
+            self._spawn(self._run_batch(requests, invalid_responses))
+        else:
+            await self._run_batch(requests, invalid_responses)
+
+    async def _run_batch(self, requests: list, invalid_responses: list):
+        """并发执行批量请求，并以单个数组帧发送所有响应"""
+        try:
+            results = await asyncio.gather(*(self._execute_with_policy(r) for r in requests))
+            responses = invalid_responses + [r for r in results if r is not None]
+            # 全部为通知时不发送任何内容
+            if responses:
+                await self._send_payload(responses)
+        except Exception as e:
+            self.logger.error(f"处理RPC批量请求出错: {e}")
+
+    @staticmethod
+    def _stamp_deadline(request: dict):
+        """收到请求时把对端携带的剩余超时换算为本地截止时间，排队时间也计入"""
+        timeout = request.get('timeout')
+        if isinstance(timeout, (int, float)) and not isinstance(timeout, bool):
+            request['_deadline'] = time.monotonic() + timeout
+
     async def _process_single_message(self, data: dict):
         """处理单个消息"""
         # 判断是请求还是响应
         if 'method' in data:
-            await self._handle_request(data)
+            self._stamp_deadline(data)
+            if self.concurrent and data.get('method') not in self._inline_methods:
+                self._dispatch_request(data)
+            else:
+                await self._handle_request(data)
         elif 'id' in data:
             self._handle_response(data)
 
     async def _message_handler(self, websocket: WebSocketServerProtocol):
         """消息处理主循环"""
         self.websocket = websocket
+        if self.heartbeat_interval > 0:
+            self._heartbeat_task = self._spawn(self._heartbeat_loop(websocket))
 
         try:
             async for message in websocket:
                 try:
-                    data = json.loads(message)
+                    data = self._decode_message(message)
 
                     # 批量请求/响应
                     if isinstance(data, list):
-                        for item in data:
-                            await self._process_single_message(item)
+                        await self._handle_batch(data)
                     # 单个请求/响应
                     else:
                         await self._process_single_message(data)
 
-                except json.JSONDecodeError:
+                except RPCParseError:
                     if websocket.state.name != 'CLOSED':
                         await websocket.send(json.dumps({
                             'jsonrpc': '2.0',
@@ -211,11 +1122,14 @@ class WebSocketRPC:
 
         finally:
             self.websocket = None
-            # 清除所有未完成的请求
-            for future in self.pending_responses.values():
-                if not future.done():
-                    future.set_exception(ConnectionAbortedError("WebSocket connection closed"))
-            self.pending_responses.clear()
+            if self._heartbeat_task is not None:
+                self._heartbeat_task.cancel()
+                self._heartbeat_task = None
+            self._abort_outbox()
+            # 编解码器按连接协商，断开后恢复json
+            self.serializer = self.serializers["json"]
+            # 清除所有未完成的请求（可重发的保留到重连）
+            self._fail_pending()
 
     async def serve(self, host: str = "localhost", port: int = 8765):
         """
@@ -225,3 +1139,98 @@ class WebSocketRPC:
         """
         async with websockets.serve(self._message_handler, host, port):
             await asyncio.Future()  # 运行直到被中断
+
+
+class ReconnectingSession:
+    """
+    自动重连的WebSocket会话
+    连接断开后按带抖动的指数退避重连，每次连上后协商编解码器、执行on_connect（如注册节点），
+    再重发断线时保留的可重放调用
+    """
+
+    def __init__(self, rpc: WebSocketRPC, uri: str,
+                 on_connect: Optional[Callable[[], Awaitable[Any]]] = None,
+                 min_backoff: float = 0.5, max_backoff: float = 30.0):
+        """
+        :param rpc: 被管理的WebSocketRPC实例
+        :param uri: 后端WebSocket地址
+        :param on_connect: 每次连接建立后执行的协程函数
+        :param min_backoff: 重连退避的初始时间（秒）
+        :param max_backoff: 重连退避的最大时间（秒）
+        """
+        self.rpc = rpc
+        self.uri = uri
+        self.on_connect = on_connect
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.connected = asyncio.Event()
+        self.reconnect_count = 0
+        self._stopped = False
+        self._stop_event = asyncio.Event()
+        self._websocket = None
+        self.logger = logging.getLogger(__name__)
+        rpc.replay_on_reconnect = True
+
+    def _backoff(self, attempt: int) -> float:
+        """带完全抖动的指数退避时间"""
+        ceiling = min(self.max_backoff, self.min_backoff * (2 ** attempt))
+        return random.uniform(self.min_backoff / 2, ceiling)
+
+    async def _sleep(self, delay: float):
+        """等待重连退避时间，stop()被调用时立即返回"""
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self):
+        """保持连接直到stop()被调用"""
+        attempt = 0
+        while not self._stopped:
+            try:
+                self._websocket = await websockets.connect(self.uri)
+            except Exception as e:
+                delay = self._backoff(attempt)
+                attempt += 1
+                self.logger.warning(f"连接后端失败: {e}，{delay:.1f}秒后重试")
+                await self._sleep(delay)
+                continue
+            if self._stopped:
+                # 连接建立期间stop()已被调用
+                await self._websocket.close()
+                self._websocket = None
+                break
+
+            websocket = self._websocket
+            self.rpc.websocket = websocket
+            handler = asyncio.create_task(self.rpc._message_handler(websocket))
+            try:
+                await self.rpc.negotiate_serializer()
+                if self.on_connect is not None:
+                    await self.on_connect()
+                await self.rpc.replay_pending()
+            except Exception as e:
+                self.logger.error(f"连接初始化失败: {e}")
+                await websocket.close()
+            else:
+                attempt = 0
+                self.connected.set()
+                self.logger.info("已连接到后端")
+
+            await handler
+            self.connected.clear()
+            self._websocket = None
+            if self._stopped:
+                break
+            self.reconnect_count += 1
+            delay = self._backoff(attempt)
+            attempt += 1
+            self.logger.warning(f"与后端的连接已断开，{delay:.1f}秒后重连")
+            await self._sleep(delay)
+
+    async def stop(self):
+        """停止会话并关闭当前连接"""
+        self._stopped = True
+        self._stop_event.set()
+        if self._websocket is not None:
+            await self._websocket.close()
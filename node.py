@@ -2,45 +2,78 @@ import asyncio
 import json
 import uuid
 import os
-import io
 import hashlib
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set, Awaitable, TYPE_CHECKING
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import logging
+import logging.handlers
+import queue
+import atexit
+import signal
 import threading
-import websockets
+import weakref
 
 # Load environment variables from .env for local runs.
 from dotenv import load_dotenv
 
-# Force matplotlib to use a non-GUI backend before EasyTeleop imports (Visualizer defaults to TkAgg)
-import matplotlib
+from WebSocketRPC import WebSocketRPC, ReconnectingSession
+from HardwareExecutor import HardwareExecutor
+from ProbeCache import TTLCache
+from StatusPublisher import StatusPublisher
+from Telemetry import TelemetryPublisher, EventRateMeter, parse_rates
+from PostProcessScheduler import PostProcessScheduler
+from PostProcessJobs import PostProcessJobQueue
+from PostProcessIndex import scan_session
+from ChunkedUploader import ChunkedUploader, UploadLedger, BandwidthLimiter
+from TransferScheduler import TransferScheduler
+# EasyTeleop（及其依赖的matplotlib、h5py、pyrealsense2等）在首次使用时才导入
+from TypeRegistry import TypeRegistry, import_easyteleop
 
-matplotlib.use("Agg")
-matplotlib.rcParams["backend"] = "Agg"
-matplotlib.use = lambda *args, **kwargs: None
-from EasyTeleop.Components.PostProcess import DataPostProcessor
-
-from WebSocketRPC import WebSocketRPC
-from EasyTeleop.Device import get_device_types, get_device_classes
-from EasyTeleop.Device.Camera.RealSenseCamera import RealSenseCamera
-from EasyTeleop.TeleopGroup import get_teleop_group_types, get_teleop_group_classes
+if TYPE_CHECKING:
+    from EasyTeleop.Components.PostProcess import DataPostProcessor
 
 # 添加paho-mqtt导入
 import paho.mqtt.client as mqtt
 
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """将日志记录原样放入队列，格式化和输出都在后台线程完成"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _setup_logging():
+    """配置日志：事件循环线程只入队，由后台线程写出，避免日志I/O阻塞事件循环"""
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        handlers=[_DeferredQueueHandler(log_queue)],
+    )
+    listener.start()
+    atexit.register(listener.stop)
+
+
 # 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+_setup_logging()
 
 class Node:
-    def __init__(self, backend_url: str = "http://localhost:8000",websocket_uri: str = "ws://localhost:8000/ws/rpc", mqtt_broker: str = "localhost", mqtt_port: int = 1883):
+    def __init__(self, backend_url: str = "http://localhost:8000",websocket_uri: str = "ws://localhost:8000/ws/rpc", mqtt_broker: str = "localhost", mqtt_port: int = 1883, rpc_max_concurrency: int = 16, rpc_coalesce_window: float = 0.0, rpc_codecs: Optional[List[str]] = None, rpc_heartbeat_interval: float = 0.0, hardware_workers: int = 8, hardware_serial_categories: Optional[List[str]] = None):
         self.backend_url = backend_url
         self.node_id = None
-        self.websocket_rpc = WebSocketRPC()
+        # 并发分发RPC请求，慢请求不会阻塞其他请求和响应；可选合并发送调用/通知
+        self.websocket_rpc = WebSocketRPC(
+            concurrent=True,
+            max_concurrency=rpc_max_concurrency,
+            coalesce_window=rpc_coalesce_window,
+            codecs=rpc_codecs,
+            heartbeat_interval=rpc_heartbeat_interval,
+        )
         
         self.websocket_uri = websocket_uri
         
@@ -48,19 +81,77 @@ class Node:
         self.mqtt_broker = mqtt_broker
         self.mqtt_port = mqtt_port
         self.mqtt_client = None
+        # 状态发布：按主题去重、防抖和限速
+        self.status_publisher = StatusPublisher()
+        # 聚合状态快照：n-节点, d-设备, g-遥操组启动状态, c-遥操组采集状态
+        self._state: Dict[str, Any] = {"n": "0", "d": {}, "g": {}, "c": {}}
+        # 以毫秒时间戳为起点，节点重启后版本号仍然递增
+        self._state_version = int(time.time() * 1000)
+        self._state_lock = threading.Lock()
+        self.offline_publish_timeout = 3.0
         
         self.devices_config = []
         self.teleop_groups_config = []
         self.devices_pool: Dict[int, Any] = {}
         self.teleop_groups_pool: Dict[int, Any] = {}
+        # 运行中设备/遥操组对应的配置哈希，用于增量更新时判断配置是否变化
+        self._device_hashes: Dict[int, str] = {}
+        self._running_group_configs: Dict[int, Dict[str, Any]] = {}
+        # 硬件操作执行器：设备构造、start/stop、设备扫描等阻塞调用在线程池中执行
+        self.hardware = HardwareExecutor(max_workers=hardware_workers, serial_categories=hardware_serial_categories)
+        # 设备并发初始化：单设备超时和初始化结果
+        self.device_init_timeout = 10.0
+        # 设备连接测试的默认超时（秒）
+        self.device_test_timeout = 2.0
+        # 设备测试结果和RealSense扫描结果缓存，后台定期或热插拔时刷新
+        self.probe_cache = TTLCache(ttl=10.0)
+        self.realsense_cache = TTLCache(ttl=30.0)
+        self.realsense_refresh_interval = 0.0
+        self._realsense_context = None
+        self._realsense_watch_started = False
+        self._realsense_refresh_task: Optional[asyncio.Task] = None
+        self.device_init_results: Dict[int, Dict[str, Any]] = {}
         self.postprocess_temp_dir = "datasets/temp"
         self.postprocess_output_dir = "datasets/hdf5"
+        # Sessions are converted in a process pool with memory-aware admission
+        self.postprocess_scheduler = PostProcessScheduler()
+        # Include a content hash in source fingerprints (reads every file)
+        self.postprocess_content_hash = False
+        # Background conversion jobs, persisted so they survive restarts
+        self.postprocess_jobs = PostProcessJobQueue(
+            self.postprocess_scheduler,
+            "datasets/postprocess_jobs.json",
+            notify=self._notify_postprocess_job,
+        )
         self.view_hdf5_url = "http://localhost:5000"
-        # 获取设备类型和遥操组类型配置
-        self.device_types = get_device_types()
-        self.device_classes = get_device_classes()
-        self.teleop_group_types = get_teleop_group_types()
-        self.teleop_group_classes = get_teleop_group_classes()
+        # Chunks are read lazily and uploaded in parallel over a pooled session;
+        # acknowledged chunks are kept in a ledger so interrupted uploads resume
+        self.uploader = ChunkedUploader(
+            ledger=UploadLedger("datasets/upload_ledger.json"),
+            limiter=BandwidthLimiter(),
+        )
+        # Bulk uploads are queued by priority and share the uploader's bandwidth limit
+        self.transfer_scheduler = TransferScheduler(self.uploader, notify=self._notify_upload)
+        # 设备和遥操组只在首次注册时初始化，断线重连后保持运行
+        self._devices_initialized = False
+        # 首次连接后的MQTT、监听和后台任务是否已全部启动，未完成时下次连接重试
+        self._initialized = False
+        # 后端HTTP客户端：连接池 + 超时 + 重试，配置接口支持ETag条件请求
+        self.http_timeout = 10.0
+        self._http_session = self._build_http_session()
+        self._config_cache: Dict[str, Any] = {}
+        # RPC链路指标发布到MQTT的间隔（秒），0表示不发布
+        self.metrics_publish_interval = 0.0
+        self._metrics_task: Optional[asyncio.Task] = None
+        # 后台任务（热插拔后的重新扫描、超时设备的停止等），保持引用直到完成
+        self._background_tasks: Set[asyncio.Task] = set()
+        # 高频遥测：从运行中的设备/遥操组采样，降采样、合并、压缩后发布到 node/{id}/telemetry/...
+        self.telemetry_enabled = False
+        self.telemetry = TelemetryPublisher(self._telemetry_sources)
+        # 设备 -> 帧率计数，设备移除后自动清理
+        self._frame_meters: "weakref.WeakKeyDictionary[Any, EventRateMeter]" = weakref.WeakKeyDictionary()
+        # 设备类型和遥操组类型：类在首次实例化时导入，类型配置在首次请求时计算或从缓存文件读取
+        self.type_registry = TypeRegistry("datasets/type_cache.json")
         
         # 注册RPC方法
         self._register_rpc_methods()
@@ -68,19 +159,95 @@ class Node:
     def _register_rpc_methods(self):
         """注册Node端需要实现的RPC方法"""
         self.websocket_rpc.register_method("node.test_device", self.test_device)
-        self.websocket_rpc.register_method("node.update_config", self.update_config)
-        self.websocket_rpc.register_method("node.start_teleop_group", self.start_teleop_group)
-        self.websocket_rpc.register_method("node.stop_teleop_group", self.stop_teleop_group)
+        self.websocket_rpc.register_method("node.test_devices", self.test_devices)
+        # 生命周期相关方法共享同一串行组，按到达顺序逐个执行；开始执行后不可取消，避免设备池与实际状态不一致
+        self.websocket_rpc.register_method("node.update_config", self.update_config, serial_group="lifecycle",
+                                            cancellable=False)
+        self.websocket_rpc.register_method("node.start_teleop_group", self.start_teleop_group, serial_group="lifecycle",
+                                            cancellable=False)
+        self.websocket_rpc.register_method("node.stop_teleop_group", self.stop_teleop_group, serial_group="lifecycle",
+                                            cancellable=False)
         self.websocket_rpc.register_method("node.get_device_types", self.get_device_types)
         self.websocket_rpc.register_method("node.get_teleop_group_types", self.get_teleop_group_types)
         self.websocket_rpc.register_method("node.get_node_id", self.get_node_id)
         self.websocket_rpc.register_method("node.get_rpc_methods", self.get_rpc_methods)
+        self.websocket_rpc.register_method("node.get_metrics", self.get_metrics)
+        self.websocket_rpc.register_method("node.get_device_init_status", self.get_device_init_status)
         self.websocket_rpc.register_method("node.custom.realsense.find_device", self.find_realsense_devices)
+        self.websocket_rpc.register_method("node.custom.cache.invalidate", self.invalidate_probe_cache)
         self.websocket_rpc.register_method("node.custom.test_device", self.test_device)
         self.websocket_rpc.register_method("node.custom.postprocess.list_sessions", self.list_postprocess_sessions)
         self.websocket_rpc.register_method("node.custom.postprocess.process_session", self.process_postprocess_session)
         self.websocket_rpc.register_method("node.custom.postprocess.process_all", self.process_all_postprocess_sessions)
         self.websocket_rpc.register_method("node.custom.postprocess.upload_hdf5", self.upload_postprocess_hdf5)
+        self.websocket_rpc.register_method("node.custom.postprocess.upload_all", self.upload_all_postprocess_hdf5)
+        self.websocket_rpc.register_method("node.custom.postprocess.upload_status", self.get_upload_status)
+        self.websocket_rpc.register_method("node.custom.postprocess.cancel_uploads", self.cancel_uploads)
+        self.websocket_rpc.register_method("node.custom.postprocess.enqueue", self.enqueue_postprocess_jobs)
+        self.websocket_rpc.register_method("node.custom.postprocess.get_job", self.get_postprocess_job)
+        self.websocket_rpc.register_method("node.custom.postprocess.cancel_job", self.cancel_postprocess_job)
+        self.websocket_rpc.register_method("node.custom.postprocess.list_jobs", self.list_postprocess_jobs)
+        # 节点发往后端的调用：每次连接建立后都会重新注册，断线时在途的注册请求直接失败，不在重连后重发
+        self.websocket_rpc.set_reconnect_policy("backend.register", "fail")
+        self.websocket_rpc.set_method_timeout("backend.register", 10.0)
+
+    async def get_metrics(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        获取节点与后端之间RPC链路的指标
+        Response:
+        {
+          "rtt": {"<peer>": {"count": 10, "p50_ms": 1.2, "p95_ms": 3.4, "p99_ms": 5.6, ...}},
+          "methods": {"node.test_device": {"latency": {...}, "queue_wait": {...}, "errors": 0}},
+          "send": {...},
+          ...
+        }
+        """
+        metrics = self.websocket_rpc.get_metrics()
+        metrics["hardware"] = self.hardware.get_stats()
+        metrics["status_publisher"] = self.status_publisher.get_stats()
+        metrics["telemetry"] = self.telemetry.get_stats()
+        metrics["postprocess"] = self.postprocess_scheduler.get_stats()
+        metrics["cache"] = {
+            "test_device": self.probe_cache.get_stats(),
+            "realsense": self.realsense_cache.get_stats(),
+        }
+        metrics["node_id"] = self.node_id
+        metrics["timestamp"] = time.time()
+        return metrics
+
+    async def _publish_metrics_loop(self):
+        """定期将RPC链路指标发布到MQTT"""
+        while True:
+            await asyncio.sleep(self.metrics_publish_interval)
+            if not (self.mqtt_client and self.node_id):
+                continue
+            try:
+                metrics = await self.get_metrics()
+                self.mqtt_client.publish(f"node/{self.node_id}/metrics", json.dumps(metrics), qos=0, retain=False)
+            except Exception as e:
+                print(f"发布RPC指标失败: {e}")
+
+    def _telemetry_sources(self) -> Dict[str, Any]:
+        """
+        遥测数据源（在采样线程中调用）
+        只读取SDK对象已有的属性，不调用硬件接口，也不替换遥操组注册的事件回调
+        :return: 流名称 -> (数据类型, 采样函数)
+        """
+        sources = {}
+        for device_id, device in list(self.devices_pool.items()):
+            def connected(d=device):
+                return getattr(d, "get_conn_status", lambda: 1)() == 1
+            if hasattr(device, "current_joint_data"):
+                sources[f"device/{device_id}/joint"] = ("joint", lambda d=device: d.current_joint_data if connected(d) else None)
+                sources[f"device/{device_id}/pose"] = ("pose", lambda d=device: d.current_pose_data if connected(d) else None)
+                sources[f"device/{device_id}/end_effector"] = (
+                    "end_effector", lambda d=device: d.current_end_effector_data if connected(d) else None)
+            meter = self._frame_meters.get(device)
+            if meter is not None:
+                sources[f"device/{device_id}/fps"] = ("fps", lambda d=device, m=meter: m() if connected(d) else None)
+        for group_id, group in list(self.teleop_groups_pool.items()):
+            sources[f"group/{group_id}/status"] = ("status", lambda g=group: dict(g.get_status()))
+        return sources
 
     async def get_rpc_methods(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
         """
@@ -89,25 +256,58 @@ class Node:
         metadata = {
             "node.custom.test_device": {
                 "description": "测试设备连通性",
-                "params": {"category": "string", "type": "string", "config": "object"},
+                "params": {"category": "string", "type": "string", "config": "object", "timeout": "number", "refresh": "boolean"},
+            },
+            "node.custom.realsense.find_device": {"description": "扫描可用RealSense设备", "params": {"refresh": "boolean"}},
+            "node.custom.cache.invalidate": {
+                "description": "清除设备测试和RealSense扫描缓存",
+                "params": {"cache": "string"},
             },
-            "node.custom.realsense.find_device": {"description": "扫描可用RealSense设备", "params": {}},
             "node.custom.postprocess.list_sessions": {
-                "description": "List temp sessions available for post-processing",
-                "params": {},
+                "description": "List temp sessions available for post-processing with their conversion status",
+                "params": {"verify": "boolean"},
             },
             "node.custom.postprocess.process_session": {
-                "description": "Convert one session to HDF5",
-                "params": {"session_id": "string"},
+                "description": "Convert one session to HDF5, optionally queueing it for upload",
+                "params": {"session_id": "string", "upload": "boolean"},
             },
             "node.custom.postprocess.process_all": {
-                "description": "Process all sessions under temp_dir",
-                "params": {},
+                "description": "Process new or modified sessions under temp_dir, optionally uploading each as it finishes",
+                "params": {"force": "boolean", "hash": "boolean", "upload": "boolean"},
             },
             "node.custom.postprocess.upload_hdf5": {
-                "description": "Upload processed HDF5 to view_hdf5 server",
+                "description": "Upload processed HDF5 to view_hdf5 server (resumes interrupted uploads)",
                 "params": {"session_id": "string"},
             },
+            "node.custom.postprocess.upload_all": {
+                "description": "Queue every HDF5 not yet uploaded to view_hdf5, ordered by priority",
+                "params": {"session_ids": "array", "priority": "object", "order": "string",
+                           "force": "boolean", "bandwidth_mb_per_s": "number"},
+            },
+            "node.custom.postprocess.upload_status": {
+                "description": "Aggregate progress and throughput of queued uploads",
+                "params": {},
+            },
+            "node.custom.postprocess.cancel_uploads": {
+                "description": "Drop queued uploads (the file being uploaded finishes)",
+                "params": {},
+            },
+            "node.custom.postprocess.enqueue": {
+                "description": "Queue background HDF5 conversion jobs (all sessions when no id is given)",
+                "params": {"session_id": "string", "session_ids": "array", "force": "boolean", "hash": "boolean"},
+            },
+            "node.custom.postprocess.get_job": {
+                "description": "Get a post-processing job",
+                "params": {"job_id": "string"},
+            },
+            "node.custom.postprocess.cancel_job": {
+                "description": "Cancel a post-processing job",
+                "params": {"job_id": "string"},
+            },
+            "node.custom.postprocess.list_jobs": {
+                "description": "List post-processing jobs",
+                "params": {"status": "string"},
+            },
         }
 
         methods_info = []
@@ -124,133 +324,214 @@ class Node:
             )
         return {"methods": methods_info}
 
-    def _build_post_processor(self) -> DataPostProcessor:
-        """Create a DataPostProcessor using default paths."""
-        return DataPostProcessor(
+    async def _build_post_processor(self) -> "DataPostProcessor":
+        """Create a DataPostProcessor using default paths (imported off the event loop on first use)."""
+        post_process = await asyncio.to_thread(import_easyteleop, "EasyTeleop.Components.PostProcess")
+        return post_process.DataPostProcessor(
             temp_dir=self.postprocess_temp_dir,
             output_dir=self.postprocess_output_dir,
         )
 
     async def list_postprocess_sessions(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
-        """List temp sessions available for post-processing."""
-        processor = self._build_post_processor()
+        """
+        List temp sessions available for post-processing.
+        Status comes from the post-processing index (new / converted / output_missing);
+        pass {"verify": true} to also re-fingerprint sources and detect "modified" sessions.
+        """
+        verify = bool(params.get("verify")) if isinstance(params, dict) else False
+        processor = await self._build_post_processor()
         sessions = await asyncio.to_thread(processor.find_sessions)
+        index = self.postprocess_scheduler.get_index(processor.output_dir)
+
+        def describe_all():
+            return {
+                session_id: index.describe(session_id, scan_session(processor.temp_dir, session_id) if verify else None)
+                for session_id in sessions
+            }
+
         return {
             "sessions": sessions,
+            "statuses": await asyncio.to_thread(describe_all),
             "temp_dir": processor.temp_dir,
             "output_dir": processor.output_dir,
         }
 
     async def process_postprocess_session(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Convert a single session to HDF5."""
+        """
+        Convert a single session to HDF5.
+        Request params: {"session_id": "...", "upload": false}
+        upload hashes the output in the worker and queues it for upload to view_hdf5 right away.
+        """
         if not isinstance(params, dict):
             return {"success": False, "message": "params must be a dict"}
 
         session_id = params.get("session_id")
         if not session_id:
             return {"success": False, "message": "session_id is required"}
+        upload = bool(params.get("upload", False))
 
-        processor = self._build_post_processor()
+        processor = await self._build_post_processor()
 
-        try:
-            await asyncio.to_thread(processor.process_session_to_hdf5, session_id, None)
-            output_path = os.path.join(processor.output_dir, f"{session_id}.hdf5")
-            return {
-                "success": True,
-                "session": session_id,
-                "output_file": output_path,
-                "temp_dir": processor.temp_dir,
-            }
-        except Exception as exc:
-            return {"success": False, "message": str(exc)}
+        result = await self.postprocess_scheduler.process(processor.temp_dir, processor.output_dir, session_id,
+                                                          hash_output=upload)
+        if not result["success"]:
+            return {"success": False, "message": result["message"]}
+        response = {
+            "success": True,
+            "session": session_id,
+            "output_file": result["output_file"],
+            "temp_dir": processor.temp_dir,
+            "duration_ms": result["duration_ms"],
+        }
+        if upload:
+            response["upload_batch_id"] = self._queue_converted_upload(result)
+        return response
+
+    def _queue_converted_upload(self, result: Dict[str, Any]) -> Optional[str]:
+        """
+        Hand a converted session to the transfer scheduler, reusing the MD5 computed during conversion.
+        The MD5 is pinned to the output's size and mtime recorded in the index, so the uploader
+        re-hashes the file if it is rewritten before the upload starts.
+        """
+        files = self._find_pending_uploads([result["session"]], force=False)
+        if not files:
+            return None
+        output_md5 = result.get("output_md5")
+        index = self.postprocess_scheduler.get_index(os.path.dirname(result["output_file"]))
+        entry = index.entries.get(result["session"]) or {}
+        if output_md5 and entry.get("output_md5") == output_md5:
+            files[0]["file_md5"] = output_md5
+            files[0]["md5_stat"] = (entry["output_size"], entry["output_mtime_ns"])
+        return self.transfer_scheduler.submit(files, self.view_hdf5_url)["batch_id"]
 
     async def process_all_postprocess_sessions(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Process every available session under temp_dir."""
-        processor = self._build_post_processor()
+        """
+        Process every new or modified session under temp_dir in parallel.
+        Request params: {"force": false, "hash": false, "upload": false}
+        force re-converts unchanged sessions; hash adds a content hash to the source fingerprint.
+        Each session result is pushed to the backend as a
+        backend.postprocess.session_result notification as soon as it finishes.
+        upload queues each output for upload as soon as its session finishes, so uploads overlap
+        with the remaining conversions; outputs are hashed in the worker and not re-read for the MD5.
+        Upload progress follows the upload_all notifications.
+        """
+        params = params if isinstance(params, dict) else {}
+        force = bool(params.get("force", False))
+        content_hash = bool(params.get("hash", self.postprocess_content_hash))
+        upload = bool(params.get("upload", False))
+        processor = await self._build_post_processor()
         try:
             sessions = await asyncio.to_thread(processor.find_sessions)
         except Exception as exc:
             return {"success": False, "message": str(exc)}
 
         processed = []
+        skipped = []
         failed: Dict[str, str] = {}
+        results = []
+        upload_batch_id = None
+        started = time.perf_counter()
 
-        for session_id in sessions:
-            try:
-                await asyncio.to_thread(processor.process_session_to_hdf5, session_id)
-                processed.append(session_id)
-            except Exception as exc:
-                failed[session_id] = str(exc)
+        async for result in self.postprocess_scheduler.run(processor.temp_dir, processor.output_dir, sessions,
+                                                           skip_unchanged=not force, content_hash=content_hash,
+                                                           hash_output=upload):
+            if upload and result["success"]:
+                upload_batch_id = self._queue_converted_upload(result) or upload_batch_id
+            if result.get("skipped"):
+                skipped.append(result["session"])
+                continue
+            if result["success"]:
+                processed.append(result["session"])
+            else:
+                failed[result["session"]] = result["message"]
+            results.append(result)
+            await self._notify_postprocess_result(result)
 
         return {
             "success": len(failed) == 0,
             "processed": processed,
+            "skipped": skipped,
             "failed": failed,
+            "results": results,
+            "duration_ms": (time.perf_counter() - started) * 1000.0,
             "temp_dir": processor.temp_dir,
             "output_dir": processor.output_dir,
+            "upload_batch_id": upload_batch_id,
         }
 
-    def _upload_file_to_view_hdf5(self, file_path: str) -> Dict[str, Any]:
-        """Upload an HDF5 file to view_hdf5 using chunked API."""
-        if not os.path.exists(file_path):
-            return {"success": False, "message": f"file not found: {file_path}"}
-
-        upload_url = f"{self.view_hdf5_url}/api/upload_chunk"
-        merge_url = f"{self.view_hdf5_url}/api/merge_chunks"
-        chunk_size = 5 * 1024 * 1024  # 5MB
-
-        # Read file and split into chunks while computing md5
-        chunks: List[bytes] = []
-        md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            while True:
-                data = f.read(chunk_size)
-                if not data:
-                    break
-                md5.update(data)
-                chunks.append(data)
-
-        total_chunks = len(chunks)
-        file_md5 = md5.hexdigest()
-        filename = os.path.basename(file_path)
-
-        for idx, data in enumerate(chunks):
-            files = {"chunk": ("chunk", io.BytesIO(data))}
-            form = {
-                "file_md5": file_md5,
-                "filename": filename,
-                "chunk_index": str(idx),
-                "total_chunks": str(total_chunks),
-            }
-            resp = requests.post(upload_url, files=files, data=form, timeout=30)
-            if resp.status_code != 200:
-                return {"success": False, "message": f"upload chunk {idx} failed: {resp.text}"}
-            try:
-                resp_json = resp.json()
-            except Exception:
-                return {"success": False, "message": f"upload chunk {idx} failed: invalid response"}
-            if not resp_json.get("success"):
-                return {"success": False, "message": f"upload chunk {idx} failed: {resp_json}"}
-
-        merge_payload = {"file_md5": file_md5, "filename": filename, "total_chunks": total_chunks}
-        merge_resp = requests.post(merge_url, json=merge_payload, timeout=30)
-        if merge_resp.status_code != 200:
-            return {"success": False, "message": f"merge failed: {merge_resp.text}"}
+    async def _notify_postprocess_result(self, result: Dict[str, Any]):
+        """Push a finished session result to the backend; best effort."""
+        try:
+            await self.websocket_rpc.call("backend.postprocess.session_result", dict(result, node_id=self.node_id), is_notification=True)
+        except Exception as exc:
+            print(f"Failed to notify post-process result for {result.get('session')}: {exc}")
+
+    async def _notify_postprocess_job(self, event: str, job: Dict[str, Any]):
+        """Push job progress/completion as backend.postprocess.job_progress / job_finished."""
         try:
-            merge_json = merge_resp.json()
-        except Exception:
-            return {"success": False, "message": "merge failed: invalid response"}
-        if not merge_json.get("success"):
-            return {"success": False, "message": f"merge failed: {merge_json}"}
+            await self.websocket_rpc.call(f"backend.postprocess.{event}", dict(job, node_id=self.node_id), is_notification=True)
+        except Exception as exc:
+            print(f"Failed to notify post-process job {job.get('id')}: {exc}")
 
+    async def enqueue_postprocess_jobs(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Queue sessions for background conversion and return job ids immediately.
+        Request params: {"session_id": "..."} or {"session_ids": [...]}; all sessions when omitted.
+        Unchanged sessions finish immediately with "skipped": true unless {"force": true}.
+        Progress is pushed as backend.postprocess.job_progress notifications:
+        {"id": "<job_id>", "session": "...", "status": "running", "progress": 0.42,
+         "frames": 420, "total_frames": 1000, "fps": 85.3, "mb_per_s": 12.5, ...}
+        and completion as backend.postprocess.job_finished with the same fields.
+        """
+        params = params if isinstance(params, dict) else {}
+        force = bool(params.get("force", False))
+        content_hash = bool(params.get("hash", self.postprocess_content_hash))
+        session_ids = params.get("session_ids")
+        if params.get("session_id"):
+            session_ids = [params["session_id"]]
+        processor = await self._build_post_processor()
+        if not session_ids:
+            try:
+                session_ids = await asyncio.to_thread(processor.find_sessions)
+            except Exception as exc:
+                return {"success": False, "message": str(exc)}
+
+        self.postprocess_jobs.start()
+        jobs = [
+            self.postprocess_jobs.enqueue(session_id, processor.temp_dir, processor.output_dir,
+                                          force=force, content_hash=content_hash)
+            for session_id in session_ids
+        ]
         return {
             "success": True,
-            "file_path": merge_json.get("file_path"),
-            "filename": merge_json.get("filename", filename),
-            "total_chunks": total_chunks,
-            "file_md5": file_md5,
+            "jobs": [{"id": job["id"], "session": job["session"], "status": job["status"]} for job in jobs],
         }
 
+    async def get_postprocess_job(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Get one post-processing job by id."""
+        job_id = params.get("job_id") if isinstance(params, dict) else None
+        job = self.postprocess_jobs.get(job_id) if job_id else None
+        if job is None:
+            return {"success": False, "message": f"job not found: {job_id}"}
+        return {"success": True, "job": job}
+
+    async def cancel_postprocess_job(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Cancel a queued or running post-processing job."""
+        job_id = params.get("job_id") if isinstance(params, dict) else None
+        job = self.postprocess_jobs.cancel(job_id) if job_id else None
+        if job is None:
+            return {"success": False, "message": f"job not found: {job_id}"}
+        return {"success": job["status"] in ("cancelling", "cancelled"), "job": job}
+
+    async def list_postprocess_jobs(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """List post-processing jobs, optionally filtered by status."""
+        status = params.get("status") if isinstance(params, dict) else None
+        return {"success": True, "jobs": self.postprocess_jobs.list(status)}
+
+    def _upload_file_to_view_hdf5(self, file_path: str) -> Dict[str, Any]:
+        """Upload an HDF5 file to view_hdf5 using chunked API (streamed, parallel chunks)."""
+        return self.uploader.upload(file_path, self.view_hdf5_url)
+
     async def upload_postprocess_hdf5(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
         """Upload a processed HDF5 file to view_hdf5 via chunked API."""
         if not isinstance(params, dict):
@@ -263,22 +544,180 @@ class Node:
         result = await asyncio.to_thread(self._upload_file_to_view_hdf5, file_path)
         return result
 
+    async def _notify_upload(self, event: str, info: Dict[str, Any]):
+        """Push bulk upload events as backend.postprocess.upload_progress / upload_result / upload_finished."""
+        try:
+            await self.websocket_rpc.call(f"backend.postprocess.{event}", dict(info, node_id=self.node_id), is_notification=True)
+        except Exception as exc:
+            print(f"Failed to notify upload {event}: {exc}")
+
+    def _find_pending_uploads(self, session_ids: Optional[List[str]], force: bool) -> List[Dict[str, Any]]:
+        """HDF5 files in the output dir that have not been uploaded to view_hdf5 yet."""
+        output_dir = self.postprocess_output_dir
+        if session_ids is None:
+            try:
+                names = [name for name in os.listdir(output_dir) if name.endswith(".hdf5")]
+            except FileNotFoundError:
+                names = []
+            session_ids = [name[:-len(".hdf5")] for name in names]
+        files = []
+        for session_id in session_ids:
+            file_path = os.path.join(output_dir, f"{session_id}.hdf5")
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            if not force and self.uploader.ledger.uploaded(file_path, stat, self.view_hdf5_url):
+                continue
+            files.append({"file_path": file_path, "session": session_id, "size": stat.st_size, "mtime": stat.st_mtime})
+        return files
+
+    async def upload_all_postprocess_hdf5(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Queue HDF5 files for upload to view_hdf5 and return immediately.
+        Request params (all optional):
+        {
+          "session_ids": [...],                 # default: every file in postprocess_output_dir
+          "priority": {"<session_id>": 10},     # higher uploads first, default 0
+          "order": "oldest",                    # tie-break within a priority: oldest/newest/smallest/largest
+          "force": false,                       # also re-upload files already uploaded
+          "bandwidth_mb_per_s": 5               # total upload bandwidth cap, 0 = unlimited
+        }
+        Progress is pushed as backend.postprocess.upload_progress notifications:
+        {"batch_id", "files_total", "files_done", "bytes_total", "bytes_done", "progress", "mb_per_s", "eta_s", ...}
+        """
+        params = params if isinstance(params, dict) else {}
+        session_ids = params.get("session_ids")
+        if session_ids is not None and not isinstance(session_ids, list):
+            return {"success": False, "message": "session_ids must be a list"}
+        priority = params.get("priority") or {}
+        if not isinstance(priority, dict):
+            return {"success": False, "message": "priority must be an object of session_id -> number"}
+        order = params.get("order", "oldest")
+        sort_keys = {
+            "oldest": lambda f: f["mtime"],
+            "newest": lambda f: -f["mtime"],
+            "smallest": lambda f: f["size"],
+            "largest": lambda f: -f["size"],
+        }
+        if order not in sort_keys:
+            return {"success": False, "message": f"order must be one of {sorted(sort_keys)}"}
+        if "bandwidth_mb_per_s" in params:
+            try:
+                self.uploader.limiter.rate = float(params["bandwidth_mb_per_s"] or 0) * 1024 * 1024
+            except (TypeError, ValueError):
+                return {"success": False, "message": "bandwidth_mb_per_s must be a number"}
+
+        files = await asyncio.to_thread(self._find_pending_uploads, session_ids, bool(params.get("force", False)))
+        files.sort(key=sort_keys[order])
+        for file in files:
+            file["priority"] = priority.get(file["session"], 0)
+        submitted = self.transfer_scheduler.submit(files, self.view_hdf5_url)
+        return {"success": True, **submitted, "status": self.transfer_scheduler.get_status()}
+
+    async def get_upload_status(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Aggregate progress of the current upload batch and the upload queue."""
+        return {"success": True, **self.transfer_scheduler.get_status()}
+
+    async def cancel_uploads(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Drop queued uploads; the file currently uploading finishes."""
+        return {"success": True, "cancelled": self.transfer_scheduler.cancel()}
+
     async def find_realsense_devices(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         查找可用的 RealSense 设备
+        Request params: {"refresh": false}  refresh为true时忽略缓存重新扫描
         Response:
         {
           "success": true,
           "devices": [
             {"name": "<device_name>", "serial": "<serial_number>"}
-          ]
+          ],
+          "cached": true,
+          "cache_age": 3.2
         }
         """
+        refresh = bool(params.get("refresh")) if isinstance(params, dict) else False
+        self._spawn(self._start_realsense_watch())
         try:
-            devices = RealSenseCamera.find_device() or []
-            return {"success": True, "devices": devices}
+            devices, age = await self.realsense_cache.get_or_load("devices", self._scan_realsense_devices, refresh=refresh)
+            return {"success": True, "devices": devices, "cached": age is not None, "cache_age": age}
         except Exception as e:
             return {"success": False, "message": str(e)}
+
+    async def _scan_realsense_devices(self) -> List[Dict[str, Any]]:
+        """枚举RealSense设备"""
+        def find_device():
+            realsense_camera = self.type_registry.get_device_class("Camera", "RealSenseCamera")
+            if realsense_camera is None:
+                raise RuntimeError("RealSenseCamera is not available")
+            return realsense_camera.find_device()
+
+        return await self.hardware.run("Camera", find_device) or []
+
+    async def invalidate_probe_cache(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        清除缓存
+        Request params: {"cache": "realsense" | "test_device" | "all"}，默认all
+        """
+        cache = params.get("cache", "all") if isinstance(params, dict) else "all"
+        removed = 0
+        if cache in ("realsense", "all"):
+            removed += self.realsense_cache.invalidate()
+        if cache in ("test_device", "all"):
+            removed += self.probe_cache.invalidate()
+        return {"success": True, "removed": removed}
+
+    def _spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        """创建后台任务并保持引用"""
+        task = asyncio.ensure_future(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    def _on_realsense_devices_changed(self):
+        """RealSense热插拔：清除缓存并在后台重新扫描"""
+        self.realsense_cache.invalidate()
+        self.probe_cache.invalidate()
+        self._spawn(self._refresh_realsense_cache())
+
+    async def _refresh_realsense_cache(self):
+        """后台刷新RealSense扫描缓存"""
+        try:
+            await self.realsense_cache.get_or_load("devices", self._scan_realsense_devices, refresh=True)
+        except Exception as e:
+            print(f"刷新RealSense设备缓存失败: {e}")
+
+    async def _realsense_refresh_loop(self):
+        """定期刷新RealSense扫描缓存"""
+        while True:
+            await self._refresh_realsense_cache()
+            await asyncio.sleep(self.realsense_refresh_interval)
+
+    async def _start_realsense_watch(self):
+        """
+        注册RealSense热插拔回调，并按配置启动定期刷新
+        只在配置了RealSense设备或首次扫描RealSense设备时启动；pyrealsense2的导入和context创建在硬件线程中进行
+        """
+        if self._realsense_watch_started:
+            return
+        self._realsense_watch_started = True
+        if self.realsense_refresh_interval > 0 and self._realsense_refresh_task is None:
+            self._realsense_refresh_task = asyncio.create_task(self._realsense_refresh_loop())
+        loop = asyncio.get_running_loop()
+
+        def create_context():
+            import pyrealsense2 as rs
+            context = rs.context()
+            context.set_devices_changed_callback(
+                lambda info: loop.call_soon_threadsafe(self._on_realsense_devices_changed)
+            )
+            return context
+
+        try:
+            self._realsense_context = await self.hardware.run("Camera", create_context)
+        except Exception as e:
+            print(f"RealSense热插拔监听不可用: {e}")
         
     async def get_node_id(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
         """
@@ -315,7 +754,8 @@ class Node:
             "type":"realman",
             "config":{
                 "ip":"192.16.0.1"
-            }
+            },
+            "timeout": 2.0
           },
           "id": 1
         }
@@ -326,39 +766,124 @@ class Node:
         if not isinstance(params, dict):
             return {"success": False, "message": "Invalid params format"}
         
-        category = params.get("category")
-        type_name = params.get("type")
-        config = params.get("config")
-        
+        return await self._cached_probe(
+            params.get("category"),
+            params.get("type"),
+            params.get("config"),
+            params.get("timeout") or self.device_test_timeout,
+            bool(params.get("refresh")),
+        )
+
+    async def test_devices(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        并发测试多个设备连接
+        Request:
+        {
+          "jsonrpc": "2.0",
+          "method": "node.test_devices",
+          "params": {
+            "devices": [
+              {"category": "robot", "type": "realman", "config": {"ip": "192.16.0.1"}},
+              {"category": "camera", "type": "RealSenseCamera", "config": {"serial": "123"}, "timeout": 5.0}
+            ],
+            "timeout": 2.0
+          },
+          "id": 1
+        }
+
+        Response:
+        {
+          "results": [
+            {"success": true, "message": "Device connected successfully", "connect_time_ms": 153.2},
+            {"success": false, "message": "Device connection timeout", "connect_time_ms": null}
+          ]
+        }
+        """
+        if not isinstance(params, dict) or not isinstance(params.get("devices"), list):
+            return {"success": False, "message": "devices must be a list"}
+
+        default_timeout = params.get("timeout") or self.device_test_timeout
+        probes = []
+        for device in params["devices"]:
+            if not isinstance(device, dict):
+                probes.append(asyncio.sleep(0, {"success": False, "message": "Invalid params format"}))
+                continue
+            probes.append(self._cached_probe(
+                device.get("category"),
+                device.get("type"),
+                device.get("config"),
+                device.get("timeout") or default_timeout,
+                bool(device.get("refresh") or params.get("refresh")),
+            ))
+        results = await asyncio.gather(*probes)
+        return {"success": all(result.get("success") for result in results), "results": results}
+
+    async def _cached_probe(self, category: str, type_name: str, config: Any, timeout: float,
+                            refresh: bool = False) -> Dict[str, Any]:
+        """
+        按 类别/类型/配置哈希 缓存设备测试结果，只缓存成功的结果
+        """
+        key = (category, type_name, self._config_hash(config))
+
+        async def probe():
+            return await self._probe_device(category, type_name, config, timeout)
+
+        result, age = await self.probe_cache.get_or_load(key, probe, refresh=refresh)
+        if not result.get("success"):
+            self.probe_cache.invalidate(key)
+        return dict(result, cached=age is not None, cache_age=age)
+
+    async def _probe_device(self, category: str, type_name: str, config: Any, timeout: float) -> Dict[str, Any]:
+        """
+        实例化并启动设备，监听status_change事件，连接成功立即返回
+        :return: 测试结果，connect_time_ms为从启动到连接成功的耗时
+        """
         # 获取设备类
-        if category not in self.device_classes or type_name not in self.device_classes[category]:
+        device_class = await self._get_device_class_by_type(category, type_name)
+        if device_class is None:
             return {"success": False, "message": f"Unsupported device type: {category}.{type_name}"}
-            
-        device_class = self.device_classes[category][type_name]
+
+        loop = asyncio.get_running_loop()
+        connected = loop.create_future()
+
+        def mark_connected():
+            if not connected.done():
+                connected.set_result(time.perf_counter())
         
         try:
             # 实例化设备
-            device = device_class(config)
+            device = await self.hardware.run(category, device_class, config)
+
+            # 状态变为1（已连接）时唤醒等待，回调可能来自设备线程
+            @device.on("status_change")
+            def on_status_change(status_info):
+                if status_info.get("new_status") == 1:
+                    loop.call_soon_threadsafe(mark_connected)
             
             # 启动设备
-            device.start()
-            
-            # 等待设备连接状态变为1（已连接），超时时间2秒
-            start_time = time.time()
-            while time.time() - start_time < 2.0:
-                if device.get_conn_status() == 1:  # 已连接
-                    device.stop()  # 测试完成后停止设备
-                    return {"success": True, "message": "Device connected successfully"}
-                await asyncio.sleep(0.1)  # 短暂休眠避免过度占用CPU
-                
-            # 超时处理
-            device.stop()  # 停止设备
-            return {"success": False, "message": "Device connection timeout"}
+            started_at = time.perf_counter()
+            await self.hardware.run(category, device.start)
+            if device.get_conn_status() == 1:
+                mark_connected()
+
+            try:
+                connected_at = await asyncio.wait_for(connected, timeout=timeout)
+            except asyncio.TimeoutError:
+                # 超时处理
+                await self.hardware.run(category, device.stop)  # 停止设备
+                return {"success": False, "message": "Device connection timeout", "connect_time_ms": None}
+
+            await self.hardware.run(category, device.stop)  # 测试完成后停止设备
+            return {
+                "success": True,
+                "message": "Device connected successfully",
+                "connect_time_ms": (connected_at - started_at) * 1000.0,
+            }
             
         except Exception as e:
             return {"success": False, "message": f"Device test failed: {str(e)}"}
         
-    async def update_config(self, params: Dict[str, Any] = None) -> None:
+    async def update_config(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         更新配置
         Notification:
@@ -367,32 +892,112 @@ class Node:
           "method": "node.update_config",
           "params": {},
         }
+        只停止、启动或重建配置发生变化的设备和遥操组，返回变更摘要
         """
-        print("收到配置更新通知，正在清空设备池和遥操组池...")
-        
-        # 停止所有正在运行的遥操组
-        for group_id, group_instance in self.teleop_groups_pool.items():
-            if hasattr(group_instance, 'running') and group_instance.running:
-                group_instance.stop()
+        print("收到配置更新通知，正在增量更新设备池和遥操组池...")
         
-        # 停止所有设备并清空设备池
-        for device_id, device_instance in self.devices_pool.items():
-            if hasattr(device_instance, 'stop'):
-                device_instance.stop()
-        
-        # 清空设备池和遥操组池
-        self.devices_pool.clear()
-        self.teleop_groups_pool.clear()
-        
-        # 从后端获取新配置
-        if self.node_id:
-            await self._fetch_devices_config()
-            await self._fetch_teleop_groups_config()
-            
-            # 根据新配置初始化设备和遥操组
-            await self._initialize_devices()
+        # 从后端获取新配置并与运行中的设备/遥操组对比
+        if not self.node_id:
+            return {"success": False, "message": "Node not registered"}
+
+        # 获取失败时保持当前运行状态，避免因后端暂时不可用而停止所有设备
+        if not await self._fetch_configs():
+            return {"success": False, "message": "Failed to fetch config from backend"}
+        summary = await self._reconcile_config()
             
-        print("配置更新完成")
+        print(f"配置更新完成，耗时 {summary['duration_ms']:.1f} ms: {summary}")
+        return summary
+
+    @staticmethod
+    def _config_hash(config: Any) -> str:
+        """计算配置内容哈希"""
+        return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    async def _reconcile_config(self) -> Dict[str, Any]:
+        """
+        将设备池和遥操组池与当前配置对齐
+        按ID和配置哈希对比：删除或变化的设备被停止并重建，
+        使用了变化设备或自身配置变化的运行中遥操组被停止，仍在配置中的会用新配置重新启动
+        """
+        started_at = time.perf_counter()
+        new_devices = {config.get("id"): config for config in self.devices_config}
+        new_groups = {config.get("id"): config for config in self.teleop_groups_config}
+
+        removed_devices = [device_id for device_id in self.devices_pool if device_id not in new_devices]
+        changed_devices = [
+            device_id for device_id in self.devices_pool
+            if device_id in new_devices and self._device_hashes.get(device_id) != self._config_hash(new_devices[device_id])
+        ]
+        added_devices = [device_id for device_id in new_devices if device_id not in self.devices_pool]
+        dirty_devices = set(removed_devices) | set(changed_devices)
+
+        # 找出需要停止的运行中遥操组
+        stopped_groups = []
+        restarted_groups = []
+        for group_id in list(self.teleop_groups_pool.keys()):
+            running_config = self._running_group_configs.get(group_id, {})
+            new_config = new_groups.get(group_id)
+            uses_dirty_device = any(device_id in dirty_devices for device_id in running_config.get("config") or [])
+            if new_config is not None and not uses_dirty_device and \
+                    self._config_hash(new_config) == self._config_hash(running_config):
+                continue
+            group_instance = self.teleop_groups_pool.pop(group_id)
+            was_running = getattr(group_instance, "running", False)
+            if was_running:
+                await self.hardware.run("TeleopGroup", group_instance.stop)
+            self._running_group_configs.pop(group_id, None)
+            stopped_groups.append(group_id)
+            if was_running and new_config is not None:
+                restarted_groups.append(group_id)
+
+        # 停止并移除被删除或配置变化的设备
+        stops = []
+        for device_id in dirty_devices:
+            device_instance = self.devices_pool.pop(device_id)
+            self._device_hashes.pop(device_id, None)
+            if hasattr(device_instance, 'stop'):
+                category = self._device_category(device_id)
+                stops.append(self.hardware.run(category, device_instance.stop))
+        for result in await asyncio.gather(*stops, return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f"停止设备失败: {result}")
+        for device_id in removed_devices:
+            self._report_device_status(device_id, 0)
+            self._update_state("d", device_id, None)
+
+        # 创建新增和配置变化的设备
+        await self._initialize_devices([new_devices[device_id] for device_id in changed_devices + added_devices])
+
+        # 用新配置重新启动受影响的遥操组
+        failed_groups = {}
+        for group_id in restarted_groups:
+            result = await self.start_teleop_group({"id": group_id})
+            if not result.get("success"):
+                failed_groups[group_id] = result.get("message")
+
+        removed_groups = [group_id for group_id in stopped_groups if group_id not in new_groups]
+        for group_id in removed_groups:
+            self._report_teleop_group_status(group_id, "0")
+            self._report_teleop_group_collecting_status(group_id, "0")
+            self._update_state("g", group_id, None)
+            self._update_state("c", group_id, None)
+
+        return {
+            "success": not failed_groups,
+            "devices": {
+                "added": added_devices,
+                "removed": removed_devices,
+                "changed": changed_devices,
+                "unchanged": len(new_devices) - len(added_devices) - len(changed_devices),
+            },
+            "teleop_groups": {
+                "stopped": stopped_groups,
+                "restarted": [group_id for group_id in restarted_groups if group_id not in failed_groups],
+                "removed": removed_groups,
+                "failed": failed_groups,
+            },
+            "duration_ms": (time.perf_counter() - started_at) * 1000.0,
+        }
         
     async def start_teleop_group(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -425,7 +1030,8 @@ class Node:
         # 获取遥操组类
         group_type = group_config.get("type")
         
-        if group_type not in self.teleop_group_classes:
+        group_class = await asyncio.to_thread(self.type_registry.get_teleop_group_class, group_type)
+        if group_class is None:
             return {"success": False, "message": f"Teleop group type {group_type} not supported"}
             
         # 构建设备对象列表
@@ -437,7 +1043,6 @@ class Node:
                 device_objects.append(None)
         
         # 实例化遥操组
-        group_class = self.teleop_group_classes[group_type]
         teleop_group_instance = group_class(device_objects)
         
         # 注册遥操组状态变化回调
@@ -451,11 +1056,12 @@ class Node:
             self._report_teleop_group_collecting_status(group_id, status_info)
         
         # 启动遥操组
-        success = teleop_group_instance.start()
+        success = await self.hardware.run("TeleopGroup", teleop_group_instance.start)
         
         if success:
             # 更新遥操组池中的实例
             self.teleop_groups_pool[group_id] = teleop_group_instance
+            self._running_group_configs[group_id] = group_config
             return {"success": True, "message": f"Teleop group {group_id} started successfully"}
         else:
             return {"success": False, "message": f"Failed to start teleop group {group_id}"}
@@ -488,14 +1094,16 @@ class Node:
         # 检查是否为运行中的遥操组实例
         if not hasattr(group_instance, 'running') or not group_instance.running:
             del self.teleop_groups_pool[group_id]
+            self._running_group_configs.pop(group_id, None)
             return {"success": False, "message": f"Teleop group {group_id} is not running"}
         
         # 停止遥操组
-        success = group_instance.stop()
+        success = await self.hardware.run("TeleopGroup", group_instance.stop)
         
         if success:
             # 从遥操组池中移除实例
             del self.teleop_groups_pool[group_id]
+            self._running_group_configs.pop(group_id, None)
             return {"success": True, "message": f"Teleop group {group_id} stopped successfully"}
         else:
             return {"success": False, "message": f"Failed to stop teleop group {group_id}"}
@@ -536,7 +1144,7 @@ class Node:
           "id": 1
         }
         """
-        return self.device_types
+        return await asyncio.to_thread(self.type_registry.get_device_types)
         
     async def get_teleop_group_types(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
         """
@@ -593,50 +1201,132 @@ class Node:
           "id": 1
         }
         """
-        return self.teleop_group_types
+        return await asyncio.to_thread(self.type_registry.get_teleop_group_types)
         
-    def _get_device_class_by_type(self, category: str, type_name: str):
-        """根据设备类别和类型获取设备类"""
-        if category in self.device_classes and type_name in self.device_classes[category]:
-            return self.device_classes[category][type_name]
-        return None
+    async def _get_device_class_by_type(self, category: str, type_name: str):
+        """根据设备类别和类型获取设备类，首次使用时在线程中导入设备模块"""
+        return await asyncio.to_thread(self.type_registry.get_device_class, category, type_name)
         
-    async def _initialize_devices(self):
-        """根据设备配置初始化设备对象并放入设备池"""
+    async def _initialize_devices(self, devices_config: Optional[List[Dict[str, Any]]] = None):
+        """
+        根据设备配置初始化设备对象并放入设备池
+        各设备在有界线程池中并发构造，单个设备超时或失败不影响其他设备
+        :param devices_config: 需要初始化的设备配置，默认为全部设备配置
+        """
         print("初始化设备...")
+        started_at = time.perf_counter()
+
+        configs = self.devices_config if devices_config is None else devices_config
+        await asyncio.gather(*(self._initialize_device(device_config) for device_config in configs))
+
+        print(f"所有设备初始化完成，耗时 {(time.perf_counter() - started_at) * 1000.0:.1f} ms")
+
+    async def _initialize_device(self, device_config: Dict[str, Any]):
+        """在线程池中构造单个设备，记录耗时和结果"""
+        # 获取设备类别和类型
+        device_id = device_config.get("id")
+        category = device_config.get("category")
+        type = device_config.get("type")
+        config = device_config.get("config", {})
+        timeout = device_config.get("init_timeout") or self.device_init_timeout
         
-        for device_config in self.devices_config:
-            # 获取设备类别和类型
-            device_id = device_config.get("id")
-            category = device_config.get("category")
-            type = device_config.get("type")
-            config = device_config.get("config", {})
+        # 获取设备类
+        device_class = await self._get_device_class_by_type(category, type)
+        if not device_class:
+            print(f"无法找到设备类: {category}.{type}")
+            self.device_init_results[device_id] = {
+                "success": False,
+                "category": category,
+                "type": type,
+                "message": f"Unsupported device type: {category}.{type}",
+                "duration_ms": 0.0,
+            }
+            return
+        if type == "RealSenseCamera":
+            # 配置了RealSense相机时监听热插拔
+            self._spawn(self._start_realsense_watch())
+
+        started_at = time.perf_counter()
+        try:
+            # 实例化设备，超时包含串行类别的排队时间；构造超时后仍在线程中进行，完成后停止该设备，避免遗留未管理的实例
+            device_instance = await self.hardware.run(
+                category, device_class, config, timeout=timeout,
+                on_late_result=lambda f, category=category: self._stop_orphan_device(category, f),
+            )
+        except asyncio.TimeoutError:
+            message = f"initialization timed out after {timeout}s"
+            print(f"设备 {device_id} ({category}.{type}) 初始化失败: {message}")
+            self._record_device_init(device_id, category, type, started_at, message)
+            return
+        except Exception as e:
+            print(f"设备 {device_id} ({category}.{type}) 初始化失败: {e}")
+            self._record_device_init(device_id, category, type, started_at, str(e))
+            return
             
-            # 获取设备类
-            device_class = self._get_device_class_by_type(category, type)
-            if not device_class:
-                print(f"无法找到设备类: {category}.{type}")
-                continue
-                
-            try:
-                # 实例化设备
-                device_instance = device_class(config)
-                
-                # 使用装饰器方式注册设备状态变化回调
-                @device_instance.on("status_change")
-                def report_device_status(status_info, device_id=device_id):
-                    # 直接上报设备状态变化
-                    self._report_device_status(device_id, status_info["new_status"])
-                
-                # 将设备实例放入设备池
-                self.devices_pool[device_id] = device_instance
-                
-                print(f"设备 {device_id} ({category}.{type}) 初始化成功")
-            except Exception as e:
-                print(f"设备 {device_id} ({category}.{type}) 初始化失败: {e}")
+        # 使用装饰器方式注册设备状态变化回调
+        @device_instance.on("status_change")
+        def report_device_status(status_info, device_id=device_id):
+            # 直接上报设备状态变化
+            self._report_device_status(device_id, status_info["new_status"])
         
-        print("所有设备初始化完成")
+        # 将设备实例放入设备池
+        self.devices_pool[device_id] = device_instance
+        if category == "Camera":
+            # 在节点侧统计帧率，不替换遥操组注册的帧回调
+            self._frame_meters[device_instance] = EventRateMeter(device_instance, "frame")
+        self._device_hashes[device_id] = self._config_hash(device_config)
+        self._record_device_init(device_id, category, type, started_at)
         
+        print(f"设备 {device_id} ({category}.{type}) 初始化成功")
+
+    def _record_device_init(self, device_id, category, type, started_at: float, error: Optional[str] = None):
+        """记录设备初始化结果"""
+        self.device_init_results[device_id] = {
+            "success": error is None,
+            "category": category,
+            "type": type,
+            "message": error or "initialized",
+            "duration_ms": (time.perf_counter() - started_at) * 1000.0,
+            "timestamp": time.time(),
+        }
+
+    def _stop_orphan_device(self, category: str, future: asyncio.Future):
+        """停止超时后才构造完成的设备"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        device_instance = future.result()
+        if not hasattr(device_instance, 'stop'):
+            return
+
+        async def stop():
+            try:
+                await self.hardware.run(category, device_instance.stop)
+            except Exception as e:
+                print(f"停止超时设备失败: {e}")
+
+        self._spawn(stop())
+
+    def _device_category(self, device_id) -> Optional[str]:
+        """获取设备池中设备的类别"""
+        for device_config in self.devices_config:
+            if device_config.get("id") == device_id:
+                return device_config.get("category")
+        result = self.device_init_results.get(device_id)
+        return result.get("category") if result else None
+
+    async def get_device_init_status(self, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        获取各设备最近一次初始化的结果和耗时
+        Response:
+        {
+          "devices": {
+            "1": {"success": true, "category": "Camera", "type": "RealSenseCamera",
+                  "message": "initialized", "duration_ms": 812.3, "timestamp": 1700000000.0}
+          }
+        }
+        """
+        return {"devices": {str(device_id): result for device_id, result in self.device_init_results.items()}}
+
     def _set_all_devices_offline(self):
         """将所有设备状态设置为离线"""
         for device_id in self.devices_pool:
@@ -675,13 +1365,21 @@ class Node:
             
             self.node_id = result.get("id")
             print(f"节点上线成功，ID: {self.node_id}")
-            
-            # 获取初始配置
-            await self._fetch_devices_config()
-            await self._fetch_teleop_groups_config()
-            
-            # 初始化设备
-            await self._initialize_devices()
+
+            # 与update_config、start/stop_teleop_group在同一串行组中互斥执行
+            async with self.websocket_rpc.serial_lock("lifecycle"):
+                # 重连后重新注册时保持现有设备和遥操组，只增量应用断线期间的配置变化
+                if self._devices_initialized:
+                    if await self._fetch_configs():
+                        await self._reconcile_config()
+                    return result
+
+                # 获取初始配置
+                await self._fetch_configs()
+
+                # 初始化设备
+                await self._initialize_devices()
+                self._devices_initialized = True
             
             return result
             
@@ -690,45 +1388,125 @@ class Node:
             raise
             
         
-    async def _fetch_devices_config(self):
-        """获取设备配置"""
+    async def on_backend_connected(self):
+        """
+        每次与后端建立连接后执行：首次注册并初始化，重连时只重新注册
+        设备初始化之后的步骤均可重复执行，某一步失败时在下次连接时继续完成
+        """
+        # 注册节点
+        await self.register_node()
+        if self._initialized:
+            return
+
+        # 设置MQTT
+        self._setup_mqtt()
+
+        # 在设备初始化完成后，将所有设备状态置为0
+        self._set_all_devices_offline()
+
+        # 将所有遥操组状态置为0
+        self._set_all_teleop_groups_offline()
+
+        # 定期发布RPC链路指标
+        if self.metrics_publish_interval > 0 and self._metrics_task is None:
+            self._metrics_task = asyncio.create_task(self._publish_metrics_loop())
+
+        # 高频遥测
+        if self.telemetry_enabled:
+            self.telemetry.start()
+
+        # 恢复上次未完成的后处理任务
+        self.postprocess_jobs.start()
+
+        self._initialized = True
+        
+    def _build_http_session(self) -> requests.Session:
+        """创建带连接池和重试的HTTP会话"""
+        session = requests.Session()
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _request_backend_config(self, path: str, etag: Optional[str]):
+        """
+        请求后端配置（在线程中执行，不访问缓存）
+        :return: (是否为304, 配置数据, 响应的ETag)
+        """
+        headers = {"If-None-Match": etag} if etag else {}
+        response = self._http_session.get(
+            f"{self.backend_url}{path}",
+            params={"node_id": self.node_id},
+            headers=headers,
+            timeout=self.http_timeout,
+        )
+        if response.status_code == 304 and etag:
+            return True, None, etag
+        if response.status_code != 200:
+            raise RuntimeError(response.text)
+        return False, response.json(), response.headers.get("ETag")
+
+    async def _get_backend_config(self, path: str):
+        """
+        从后端获取配置
+        携带上次的ETag，后端返回304时直接使用缓存；请求在线程中执行，缓存只在事件循环中读写
+        :return: (配置列表, 是否有变化)
+        """
+        cache_key = f"{path}?node_id={self.node_id}"
+        cached = self._config_cache.get(cache_key)
+        not_modified, data, etag = await asyncio.to_thread(
+            self._request_backend_config, path, cached[0] if cached else None)
+        if not_modified:
+            return cached[1], False
+        if etag:
+            self._config_cache[cache_key] = (etag, data)
+        else:
+            self._config_cache.pop(cache_key, None)
+        return data, True
+
+    async def _fetch_configs(self) -> bool:
+        """
+        并发获取设备配置和遥操组配置
+        :return: 两项配置是否都获取成功
+        """
+        results = await asyncio.gather(self._fetch_devices_config(), self._fetch_teleop_groups_config())
+        return all(results)
+
+    async def _fetch_devices_config(self) -> bool:
+        """获取设备配置，失败时保留之前的配置"""
         try:
-            response = requests.get(
-                f"{self.backend_url}/api/devices",
-                params={"node_id": self.node_id}
-            )
-            
-            if response.status_code == 200:
-                devices = response.json()
+            devices, changed = await self._get_backend_config("/api/devices")
+            if changed:
                 print(f"获取到 {len(devices)} 个设备配置")
-                self.devices_config =  devices
             else:
-                print(f"获取设备配置失败: {response.text}")
-                self.devices_config = []
+                print("设备配置未变化，使用缓存")
+            self.devices_config = devices
+            return True
                 
         except Exception as e:
             print(f"获取设备配置出错: {e}")
-            self.devices_config = []
+            return False
             
-    async def _fetch_teleop_groups_config(self):
-        """获取遥操组配置"""
+    async def _fetch_teleop_groups_config(self) -> bool:
+        """获取遥操组配置，失败时保留之前的配置"""
         try:
-            response = requests.get(
-                f"{self.backend_url}/api/teleop-groups",
-                params={"node_id": self.node_id}
-            )
-            
-            if response.status_code == 200:
-                groups = response.json()
+            groups, changed = await self._get_backend_config("/api/teleop-groups")
+            if changed:
                 print(f"获取到 {len(groups)} 个遥操组配置")
-                self.teleop_groups_config = groups
             else:
-                print(f"获取遥操组配置失败: {response.text}")
-                self.teleop_groups_config = []
+                print("遥操组配置未变化，使用缓存")
+            self.teleop_groups_config = groups
+            return True
                 
         except Exception as e:
             print(f"获取遥操组配置出错: {e}")
-            self.teleop_groups_config = []
+            return False
         
     def _setup_mqtt(self):
         """设置MQTT客户端"""
@@ -753,6 +1531,9 @@ class Node:
                 # 连接到MQTT服务器
                 self.mqtt_client.connect(self.mqtt_broker, 1883, 60)
                 self.mqtt_client.loop_start()
+                self.status_publisher.client = self.mqtt_client
+                self.telemetry.client = self.mqtt_client
+                self.telemetry.topic_prefix = f"node/{self.node_id}/telemetry"
                 
                 print("MQTT服务器连接成功")
                 
@@ -776,19 +1557,61 @@ class Node:
                 raise
             
     def _on_mqtt_disconnect(self, client, userdata, reason_code, properties=None):
-        """Best-effort offline publish before shutdown."""
+        """Best-effort offline publish before shutdown (runs on paho's network thread)."""
         try:
-            # On graceful shutdown, publish offline for all retained status topics.
+            # On graceful shutdown, queue offline for all retained status topics.
+            # Never wait for delivery here: acks are processed by this same thread.
             if reason_code == 0:
-                self._publish_all_offline()
+                self._publish_all_offline(wait_delivery=False)
         except Exception as e:
             print(f"MQTT disconnect callback error: {e}")
 
-    def _publish_all_offline(self):
-        """Publish retained offline statuses for node/devices/teleop groups."""
-        self._report_node_status(0)
+    def _publish_all_offline(self, wait_delivery: bool = True):
+        """
+        Publish retained offline statuses for node/devices/teleop groups.
+        :param wait_delivery: flush and wait (bounded) for the broker to ack; must be False inside paho callbacks
+        """
         self._set_all_devices_offline()
         self._set_all_teleop_groups_offline()
+        self._report_node_status(0)
+        if not wait_delivery:
+            return
+        # Skip the debounce window and wait (bounded) for the broker to ack,
+        # so shutdown doesn't finish before the offline state is delivered.
+        if not self.status_publisher.flush(self.offline_publish_timeout, wait_delivery=True):
+            print("部分离线状态未在超时前确认送达")
+
+    def _update_state(self, section: str, key: Any, value: Any):
+        """
+        更新聚合状态快照，有变化时发布到 node/{id}/state
+        MQTT每个连接只能有一条遗嘱消息，已用于 node/{id}/status；state主题没有遗嘱，
+        节点异常断开后broker上保留的是最后一次快照，订阅方需结合 node/{id}/status 判断，status为0时快照已失效
+        Payload:
+        {"v": 1700000000123, "ts": 1700000000.1, "n": "1", "d": {"1": "1"}, "g": {"5": "1"}, "c": {"5": "0"}}
+        """
+        with self._state_lock:
+            if section == "n":
+                if self._state["n"] == value:
+                    return
+                self._state["n"] = value
+            else:
+                bucket = self._state[section]
+                key = str(key)
+                if value is None:
+                    if bucket.pop(key, None) is None:
+                        return
+                elif bucket.get(key) == value:
+                    return
+                else:
+                    bucket[key] = value
+            self._state_version += 1
+            payload = json.dumps(
+                dict(self._state, v=self._state_version, ts=round(time.time(), 3)),
+                separators=(",", ":"),
+            )
+        if self.mqtt_client and self.node_id:
+            # 节点状态变化立即发布，设备/遥操组变化在防抖窗口内合并为一个快照
+            self.status_publisher.publish(f"node/{self.node_id}/state", payload, immediate=section == "n")
 
 
     def _report_node_status(self,status):
@@ -796,7 +1619,8 @@ class Node:
         if self.mqtt_client and self.node_id:
             topic = f"node/{self.node_id}/status"
             payload = str(status)  # 1-在线, 0-离线
-            self.mqtt_client.publish(topic, payload, qos=1, retain=True)
+            self.status_publisher.publish(topic, payload, immediate=True)
+            self._update_state("n", None, payload)
             
     def _report_device_status(self, device_id, status):
         """上报设备状态到MQTT"""
@@ -804,7 +1628,8 @@ class Node:
             topic = f"node/{self.node_id}/device/{device_id}/status"
             # status: 0-未启动, 1-启动且连接成功, 2-启动但连接有问题正在重连
             payload = str(status)
-            self.mqtt_client.publish(topic, payload, qos=1, retain=True)
+            self.status_publisher.publish(topic, payload)
+            self._update_state("d", device_id, payload)
             
     def _report_teleop_group_status(self, group_id, status):
         """上报遥操组状态到MQTT"""
@@ -812,14 +1637,16 @@ class Node:
             # 上报启动状态
             status_topic = f"node/{self.node_id}/teleop-group/{group_id}/status"
             # 0-未启动, 1-已启动
-            self.mqtt_client.publish(status_topic, status, qos=1, retain=True)
+            self.status_publisher.publish(status_topic, str(status))
+            self._update_state("g", group_id, str(status))
     def _report_teleop_group_collecting_status(self, group_id, status):
         """上报遥操组数据采集状态到MQTT"""
         if self.mqtt_client and self.node_id:
             # 上报采集状态
             collecting_topic = f"node/{self.node_id}/teleop-group/{group_id}/collecting"
             # 0-未采集, 1-采集中
-            self.mqtt_client.publish(collecting_topic, status, qos=1, retain=True)
+            self.status_publisher.publish(collecting_topic, str(status))
+            self._update_state("c", group_id, str(status))
             
             
     def _set_all_devices_offline(self):
@@ -830,45 +1657,105 @@ class Node:
 # 运行节点示例
 async def main():
     load_dotenv()
+    logging.getLogger().setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
     backend_url = os.environ.get("BACKEND_URL", "http://localhost:8000")
     websocket_uri = os.environ.get("WEBSOCKET_URI", "ws://localhost:8000/ws/rpc")
     mqtt_broker = os.environ.get("MQTT_BROKER", "localhost")
     mqtt_port = int(os.environ.get("MQTT_PORT", 1883))
     view_hdf5_url = os.environ.get("VIEW_HDF5_URL", "http://localhost:5000")
+    rpc_max_concurrency = int(os.environ.get("RPC_MAX_CONCURRENCY", 16))
+    rpc_coalesce_window = float(os.environ.get("RPC_COALESCE_WINDOW_MS", 0)) / 1000.0
+    rpc_codecs = [c.strip() for c in os.environ.get("RPC_CODECS", "msgpack,json").split(",") if c.strip()]
+    rpc_trace_max_length = int(os.environ.get("RPC_TRACE_MAX_LENGTH", 512))
+    rpc_trace_sample_rate = float(os.environ.get("RPC_TRACE_SAMPLE_RATE", 1.0))
+    rpc_heartbeat_interval = float(os.environ.get("RPC_HEARTBEAT_INTERVAL", 0))
+    metrics_publish_interval = float(os.environ.get("METRICS_PUBLISH_INTERVAL", 0))
+    hardware_workers = int(os.environ.get("HARDWARE_WORKERS", 8))
+    hardware_serial_categories = [c.strip() for c in os.environ.get("HARDWARE_SERIAL_CATEGORIES", "").split(",") if c.strip()]
+    reconnect_min_backoff = float(os.environ.get("RECONNECT_MIN_BACKOFF", 0.5))
+    reconnect_max_backoff = float(os.environ.get("RECONNECT_MAX_BACKOFF", 30.0))
 
     # 创建节点实例
-    node = Node(backend_url=backend_url, websocket_uri=websocket_uri, mqtt_broker=mqtt_broker, mqtt_port=mqtt_port)
+    node = Node(
+        backend_url=backend_url,
+        websocket_uri=websocket_uri,
+        mqtt_broker=mqtt_broker,
+        mqtt_port=mqtt_port,
+        rpc_max_concurrency=rpc_max_concurrency,
+        rpc_coalesce_window=rpc_coalesce_window,
+        rpc_codecs=rpc_codecs,
+        rpc_heartbeat_interval=rpc_heartbeat_interval,
+        hardware_workers=hardware_workers,
+        hardware_serial_categories=hardware_serial_categories,
+    )
     node.view_hdf5_url = view_hdf5_url
-    try:
-        # 连接到后端
-        websocket = await websockets.connect(node.websocket_uri)
-        print("已连接到后端")
-        node.websocket_rpc.websocket = websocket
-        
-        task = asyncio.create_task(node.websocket_rpc._message_handler(websocket))
-        
-        # 注册节点
-        await node.register_node()
-        
-        # 设置MQTT
-        node._setup_mqtt()
+    node.uploader.chunk_size = int(float(os.environ.get("UPLOAD_CHUNK_SIZE_MB", 5)) * 1024 * 1024)
+    node.uploader.max_in_flight = max(1, int(os.environ.get("UPLOAD_PARALLEL_CHUNKS", 4)))
+    node.uploader.max_retries = max(0, int(os.environ.get("UPLOAD_MAX_RETRIES", 5)))
+    node.uploader.ledger.path = os.environ.get("UPLOAD_LEDGER_FILE", "datasets/upload_ledger.json")
+    node.uploader.limiter.rate = float(os.environ.get("UPLOAD_BANDWIDTH_LIMIT_MB", 0)) * 1024 * 1024
+    postprocess_workers = int(os.environ.get("POSTPROCESS_WORKERS", 0))
+    if postprocess_workers > 0:
+        node.postprocess_scheduler.max_workers = postprocess_workers
+    node.postprocess_scheduler.memory_budget = int(os.environ.get("POSTPROCESS_MEMORY_BUDGET_MB", 0)) * 1024 * 1024
+    node.postprocess_content_hash = os.environ.get("POSTPROCESS_CONTENT_HASH", "0").lower() in ("1", "true", "yes")
+    node.postprocess_jobs.state_file = os.environ.get("POSTPROCESS_JOBS_FILE", "datasets/postprocess_jobs.json")
+    node.metrics_publish_interval = metrics_publish_interval
+    node.http_timeout = float(os.environ.get("BACKEND_HTTP_TIMEOUT", 10.0))
+    node.device_init_timeout = float(os.environ.get("DEVICE_INIT_TIMEOUT", 10.0))
+    node.type_registry.cache_file = os.environ.get("TYPE_CACHE_FILE", "datasets/type_cache.json") or None
+    node.device_test_timeout = float(os.environ.get("DEVICE_TEST_TIMEOUT", 2.0))
+    node.probe_cache.ttl = float(os.environ.get("DEVICE_TEST_CACHE_TTL", 10.0))
+    node.realsense_cache.ttl = float(os.environ.get("REALSENSE_CACHE_TTL", 30.0))
+    node.realsense_refresh_interval = float(os.environ.get("REALSENSE_REFRESH_INTERVAL", 0))
+    node.status_publisher.debounce = float(os.environ.get("STATUS_DEBOUNCE_MS", 200)) / 1000.0
+    node.status_publisher.max_rate = float(os.environ.get("STATUS_MAX_RATE", 50))
+    node.offline_publish_timeout = float(os.environ.get("OFFLINE_PUBLISH_TIMEOUT", 3.0))
+    telemetry_publish_interval = float(os.environ.get("TELEMETRY_PUBLISH_INTERVAL_MS", 0))
+    node.telemetry_enabled = telemetry_publish_interval > 0
+    node.telemetry.publish_interval = telemetry_publish_interval / 1000.0
+    node.telemetry.rates.update(parse_rates(os.environ.get("TELEMETRY_RATES", "")))
+    node.telemetry.policy = os.environ.get("TELEMETRY_BACKPRESSURE", "drop_oldest")
+    node.telemetry.compress_threshold = int(os.environ.get("TELEMETRY_COMPRESS_THRESHOLD", 512))
+    node.websocket_rpc.configure_tracing(max_length=rpc_trace_max_length, sample_rate=rpc_trace_sample_rate)
+    # 自动重连的后端会话：断线后重连并重新注册，设备和遥操组保持运行
+    session = ReconnectingSession(
+        node.websocket_rpc,
+        node.websocket_uri,
+        on_connect=node.on_backend_connected,
+        min_backoff=reconnect_min_backoff,
+        max_backoff=reconnect_max_backoff,
+    )
+    # asyncio.run把SIGINT转为主协程的CancelledError，KeyboardInterrupt在退出后才抛出；
+    # 收到SIGINT/SIGTERM时停止会话，由finally执行关闭流程
+    loop = asyncio.get_running_loop()
+    stopping: Set[asyncio.Task] = set()
 
-        # 在设备初始化完成后，将所有设备状态置为0
-        node._set_all_devices_offline()
-        
-        # 将所有遥操组状态置为0
-        node._set_all_teleop_groups_offline()
+    def request_stop():
+        task = asyncio.ensure_future(session.stop())
+        stopping.add(task)
+        task.add_done_callback(stopping.discard)
 
-        await task
-        
-    except KeyboardInterrupt:
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, request_stop)
+        except (NotImplementedError, RuntimeError):
+            # Windows不支持，SIGINT仍以CancelledError结束session.run()
+            pass
+    try:
+        await session.run()
+    except Exception as e:
+        print(f"节点运行出错: {e}")
+    finally:
         print("Node stopped.")
+        # 先停止遥测并发布剩余样本，再断开MQTT
+        node.telemetry.stop()
         if node.mqtt_client:
             node._publish_all_offline()
             node.mqtt_client.loop_stop()
             node.mqtt_client.disconnect()
-    except Exception as e:
-        print(f"节点运行出错: {e}")
+        # 排队中的转换取消，等待正在转换的会话写完后再关闭Manager进程
+        node.postprocess_scheduler.shutdown(wait=True)
 
 
 if __name__ == "__main__":
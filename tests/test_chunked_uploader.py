@@ -0,0 +1,238 @@
+import os
+import json
+
+import pytest
+
+import ChunkedUploader as chunked
+from ChunkedUploader import BandwidthLimiter, ChunkedUploader, ChunkUploadError, UploadLedger
+
+BASE_URL = "http://view-hdf5:5000"
+CHUNK_SIZE = 4
+
+
+class FakeServer:
+    """替代view_hdf5的分片上传和合并接口，记录收到的分片"""
+
+    def __init__(self, fail_chunks=(), fail_merge=False):
+        self.fail_chunks = set(fail_chunks)
+        self.fail_merge = fail_merge
+        self.received = []
+        self.merged = []
+
+    def attach(self, uploader: ChunkedUploader):
+        def upload_chunk(upload_url, file_path, file_md5, filename, index, total_chunks):
+            if index in self.fail_chunks:
+                raise ChunkUploadError(f"upload chunk {index} failed: rejected", retryable=False)
+            self.received.append(index)
+            return len(uploader.read_chunk(file_path, index))
+
+        def merge(merge_url, file_md5, filename, total_chunks):
+            if self.fail_merge:
+                raise ChunkUploadError("merge failed: missing chunks")
+            self.merged.append(file_md5)
+            return {"success": True, "file_path": f"/data/{filename}", "filename": filename}
+
+        uploader.upload_chunk = upload_chunk
+        uploader.merge = merge
+        return uploader
+
+
+def make_uploader(ledger_path, server: FakeServer) -> ChunkedUploader:
+    # 每次使用新的台账实例，模拟进程重启后从文件恢复
+    ledger = UploadLedger(str(ledger_path), save_interval=0)
+    return server.attach(ChunkedUploader(chunk_size=CHUNK_SIZE, max_in_flight=1, ledger=ledger))
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "session.hdf5"
+    path.write_bytes(b"0123456789abcdefghij")  # 5个分片
+    return path
+
+
+@pytest.fixture
+def ledger_path(tmp_path):
+    return tmp_path / "ledger" / "upload_ledger.json"
+
+
+def test_ledger_persists_acked_chunks(data_file, ledger_path):
+    stat = os.stat(data_file)
+    ledger = UploadLedger(str(ledger_path), save_interval=3600)
+    assert ledger.begin("md5", str(data_file), stat, BASE_URL, CHUNK_SIZE, 5) == []
+    ledger.ack("md5", 0)
+    ledger.ack("md5", 3)
+    # 未到保存间隔时只在flush时写入
+    assert UploadLedger(str(ledger_path)).pending()[0]["acked_chunks"] == 0
+    ledger.flush()
+
+    reloaded = UploadLedger(str(ledger_path))
+    assert reloaded.begin("md5", str(data_file), stat, BASE_URL, CHUNK_SIZE, 5) == [0, 3]
+    assert reloaded.find_md5(str(data_file), stat) == "md5"
+    assert reloaded.pending()[0]["acked_chunks"] == 2
+
+
+def test_ledger_resets_on_changed_upload_parameters(data_file, ledger_path):
+    stat = os.stat(data_file)
+    ledger = UploadLedger(str(ledger_path), save_interval=0)
+    ledger.begin("md5", str(data_file), stat, BASE_URL, CHUNK_SIZE, 5)
+    ledger.ack("md5", 1)
+    assert ledger.begin("md5", str(data_file), stat, "http://other:5000", CHUNK_SIZE, 5) == []
+    ledger.ack("md5", 1)
+    assert ledger.begin("md5", str(data_file), stat, "http://other:5000", CHUNK_SIZE * 2, 3) == []
+
+
+def test_ledger_finish_and_uploaded(data_file, ledger_path):
+    stat = os.stat(data_file)
+    ledger = UploadLedger(str(ledger_path), save_interval=0)
+    ledger.begin("md5", str(data_file), stat, BASE_URL, CHUNK_SIZE, 5)
+    ledger.ack("md5", 0)
+    assert ledger.uploaded(str(data_file), stat, BASE_URL) is None
+    ledger.finish("md5", "/data/session.hdf5")
+
+    record = UploadLedger(str(ledger_path)).uploaded(str(data_file), stat, BASE_URL)
+    assert record["file_md5"] == "md5"
+    assert record["remote_path"] == "/data/session.hdf5"
+    assert ledger.uploaded(str(data_file), stat, "http://other:5000") is None
+    assert ledger.pending() == []
+    # 已完成的文件再次上传时从头开始
+    assert ledger.begin("md5", str(data_file), stat, BASE_URL, CHUNK_SIZE, 5) == []
+
+
+def test_ledger_ignores_modified_file(data_file, ledger_path):
+    ledger = UploadLedger(str(ledger_path), save_interval=0)
+    ledger.begin("md5", str(data_file), os.stat(data_file), BASE_URL, CHUNK_SIZE, 5)
+    data_file.write_bytes(b"changed")
+    assert ledger.find_md5(str(data_file), os.stat(data_file)) is None
+
+
+def test_ledger_discard(data_file, ledger_path):
+    stat = os.stat(data_file)
+    ledger = UploadLedger(str(ledger_path), save_interval=0)
+    ledger.begin("md5", str(data_file), stat, BASE_URL, CHUNK_SIZE, 5)
+    ledger.ack("md5", 0)
+    ledger.discard("md5")
+    assert ledger.acked("md5") == []
+    assert UploadLedger(str(ledger_path)).find_md5(str(data_file), stat) is None
+
+
+def test_ledger_drops_expired_pending_entries(data_file, ledger_path):
+    stat = os.stat(data_file)
+    ledger = UploadLedger(str(ledger_path), save_interval=0)
+    ledger.begin("stale", str(data_file), stat, BASE_URL, CHUNK_SIZE, 5)
+    ledger.begin("done", str(data_file), stat, BASE_URL, CHUNK_SIZE, 5)
+    ledger.finish("done")
+    with open(ledger_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    for entry in entries.values():
+        entry["updated_at"] -= 3600
+    with open(ledger_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f)
+
+    reloaded = UploadLedger(str(ledger_path), max_age=60)
+    assert reloaded.pending() == []
+    assert reloaded.uploaded(str(data_file), stat, BASE_URL)["file_md5"] == "done"
+
+
+def test_upload_resumes_after_partial_ack(data_file, ledger_path):
+    first = FakeServer(fail_chunks={4})
+    result = make_uploader(ledger_path, first).upload(str(data_file), BASE_URL)
+    assert not result["success"]
+    assert result["uploaded_chunks"] == 4
+    assert first.received == [0, 1, 2, 3]
+
+    second = FakeServer()
+    progress = []
+    result = make_uploader(ledger_path, second).upload(
+        str(data_file), BASE_URL, on_progress=lambda nbytes, resumed: progress.append((nbytes, resumed)))
+    assert result["success"]
+    assert result["resumed_chunks"] == 4
+    assert second.received == [4]
+    assert progress == [(16, True), (4, False)]
+    assert UploadLedger(str(ledger_path)).uploaded(str(data_file), os.stat(data_file), BASE_URL) is not None
+
+
+def test_merge_failure_after_resume_discards_ledger(data_file, ledger_path):
+    make_uploader(ledger_path, FakeServer(fail_chunks={4})).upload(str(data_file), BASE_URL)
+
+    result = make_uploader(ledger_path, FakeServer(fail_merge=True)).upload(str(data_file), BASE_URL)
+    assert not result["success"]
+    assert UploadLedger(str(ledger_path)).pending() == []
+
+    # 续传记录已丢弃，下次完整上传
+    server = FakeServer()
+    result = make_uploader(ledger_path, server).upload(str(data_file), BASE_URL)
+    assert result["success"]
+    assert result["resumed_chunks"] == 0
+    assert server.received == [0, 1, 2, 3, 4]
+
+
+def test_merge_failure_without_resume_keeps_acked(data_file, ledger_path):
+    result = make_uploader(ledger_path, FakeServer(fail_merge=True)).upload(str(data_file), BASE_URL)
+    assert not result["success"]
+    assert UploadLedger(str(ledger_path)).pending()[0]["acked_chunks"] == 5
+
+
+def test_stale_file_md5_is_recomputed(data_file, ledger_path):
+    uploader = make_uploader(ledger_path, FakeServer())
+    stat = os.stat(data_file)
+    result = uploader.upload(str(data_file), BASE_URL, file_md5="stale",
+                             md5_stat=(stat.st_size, stat.st_mtime_ns - 1))
+    assert result["file_md5"] == uploader.file_md5(str(data_file))
+    result = uploader.upload(str(data_file), BASE_URL, file_md5="known",
+                             md5_stat=(stat.st_size, stat.st_mtime_ns))
+    assert result["file_md5"] == "known"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(chunked.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(chunked.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_limiter_unlimited_never_waits(clock):
+    limiter = BandwidthLimiter(0)
+    limiter.consume(10 * 1024 * 1024)
+    assert clock.slept == 0
+
+
+def test_limiter_throttles_to_rate(clock):
+    limiter = BandwidthLimiter(rate=1000)
+    # 桶初始为空，每秒补充1000字节
+    for _ in range(5):
+        limiter.consume(500)
+    assert clock.slept == pytest.approx(2.5)
+
+
+def test_limiter_allows_oversized_request(clock):
+    limiter = BandwidthLimiter(rate=1000, burst=100)
+    limiter.consume(1000)
+    assert clock.slept == pytest.approx(0.1)
+    # 透支的配额由之后的请求偿还
+    limiter.consume(100)
+    assert clock.slept == pytest.approx(1.1)
+
+
+def test_limiter_rate_change_updates_capacity(clock):
+    limiter = BandwidthLimiter(rate=1000)
+    clock.now += 10
+    limiter.rate = 100
+    assert limiter.rate == 100
+    limiter.consume(100)
+    assert clock.slept == 0
+    limiter.consume(100)
+    assert clock.slept == pytest.approx(1.0)
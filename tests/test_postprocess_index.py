@@ -0,0 +1,130 @@
+import os
+
+import pytest
+
+from PostProcessIndex import SessionIndex, scan_session
+
+SESSION = "session_001"
+
+
+@pytest.fixture
+def temp_dir(tmp_path):
+    session_path = tmp_path / "temp" / SESSION
+    (session_path / "camera").mkdir(parents=True)
+    (session_path / "camera" / "frame_000001.jpg").write_bytes(b"\xff\xd8frame1")
+    (session_path / "camera" / "frame_000002.jpg").write_bytes(b"\xff\xd8frame2")
+    (session_path / "arm.csv").write_text("timestamp,x\n0,1\n")
+    return tmp_path / "temp"
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SessionIndex(str(tmp_path / "hdf5"))
+
+
+def convert(index: SessionIndex, scan, content=b"hdf5"):
+    """模拟转换：写出输出文件并记录索引"""
+    os.makedirs(index.output_dir, exist_ok=True)
+    with open(index.output_file(SESSION), "wb") as f:
+        f.write(content)
+    index.record(SESSION, scan, output_md5="md5")
+
+
+def touch(path, delta_ns=1_000_000_000):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + delta_ns))
+
+
+def test_scan_session_counts_files_and_frames(temp_dir):
+    scan = scan_session(str(temp_dir), SESSION)
+    assert scan["files"] == 3
+    assert scan["frames"] == 2
+    assert scan["bytes"] == 8 + 8 + len("timestamp,x\n0,1\n")
+    assert scan["content_hash"] is None
+    assert scan["latest_mtime"] == pytest.approx(
+        os.stat(temp_dir / SESSION / "arm.csv").st_mtime, abs=1.0)
+
+
+def test_scan_session_fingerprint_is_stable(temp_dir):
+    first = scan_session(str(temp_dir), SESSION, content_hash=True)
+    second = scan_session(str(temp_dir), SESSION, content_hash=True)
+    assert first["fingerprint"] == second["fingerprint"]
+    assert first["content_hash"] == second["content_hash"]
+
+
+def test_scan_session_fingerprint_tracks_metadata(temp_dir):
+    before = scan_session(str(temp_dir), SESSION)
+    touch(temp_dir / SESSION / "arm.csv")
+    assert scan_session(str(temp_dir), SESSION)["fingerprint"] != before["fingerprint"]
+
+
+def test_scan_missing_session(temp_dir):
+    scan = scan_session(str(temp_dir), "missing")
+    assert (scan["files"], scan["bytes"], scan["latest_mtime"]) == (0, 0, 0)
+
+
+def test_status_new(temp_dir, index):
+    assert index.status(SESSION) == "new"
+    assert index.status(SESSION, scan_session(str(temp_dir), SESSION)) == "new"
+
+
+def test_status_converted_is_skipped(temp_dir, index):
+    convert(index, scan_session(str(temp_dir), SESSION))
+    assert index.status(SESSION) == "converted"
+    assert index.status(SESSION, scan_session(str(temp_dir), SESSION)) == "converted"
+    # 索引持久化，重启后仍然跳过
+    reloaded = SessionIndex(index.output_dir)
+    assert reloaded.status(SESSION, scan_session(str(temp_dir), SESSION)) == "converted"
+    assert reloaded.output_md5(SESSION) == "md5"
+
+
+def test_status_modified_source(temp_dir, index):
+    convert(index, scan_session(str(temp_dir), SESSION))
+    (temp_dir / SESSION / "camera" / "frame_000003.jpg").write_bytes(b"\xff\xd8frame3")
+    assert index.status(SESSION, scan_session(str(temp_dir), SESSION)) == "modified"
+    # 不提供扫描结果时只检查输出文件
+    assert index.status(SESSION) == "converted"
+
+
+def test_status_modified_content_with_same_metadata(temp_dir, index):
+    frame = temp_dir / SESSION / "camera" / "frame_000001.jpg"
+    convert(index, scan_session(str(temp_dir), SESSION, content_hash=True))
+    stat = os.stat(frame)
+    frame.write_bytes(b"\xff\xd8frameX")
+    os.utime(frame, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert index.status(SESSION, scan_session(str(temp_dir), SESSION)) == "converted"
+    assert index.status(SESSION, scan_session(str(temp_dir), SESSION, content_hash=True)) == "modified"
+
+
+def test_status_output_missing(temp_dir, index):
+    scan = scan_session(str(temp_dir), SESSION)
+    convert(index, scan)
+    os.remove(index.output_file(SESSION))
+    assert index.status(SESSION, scan) == "output_missing"
+    assert index.describe(SESSION, scan)["status"] == "output_missing"
+
+
+def test_status_output_modified(temp_dir, index):
+    scan = scan_session(str(temp_dir), SESSION)
+    convert(index, scan)
+    with open(index.output_file(SESSION), "ab") as f:
+        f.write(b"truncated?")
+    assert index.status(SESSION, scan) == "output_missing"
+    assert index.output_md5(SESSION) is None
+
+
+def test_output_md5_invalidated_by_rewrite(temp_dir, index):
+    convert(index, scan_session(str(temp_dir), SESSION))
+    touch(index.output_file(SESSION))
+    # 大小不变时仍视为已转换，但记录的MD5不再可信
+    assert index.status(SESSION) == "converted"
+    assert index.output_md5(SESSION) is None
+
+
+def test_record_without_output_forgets_session(temp_dir, index):
+    scan = scan_session(str(temp_dir), SESSION)
+    convert(index, scan)
+    os.remove(index.output_file(SESSION))
+    index.record(SESSION, scan)
+    assert index.status(SESSION, scan) == "new"
+    assert SessionIndex(index.output_dir).status(SESSION) == "new"